@@ -0,0 +1,75 @@
+"""
+列表返回序列化耗时对比：fastapi 默认路径（jsonable_encoder + JSONResponse）与 FastJSONResponse
+
+运行：python benchmarks/bench_list_response.py
+"""
+import asyncio
+import datetime
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'example')]
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+from fastapi_rf.pagination import LimitOffsetPagination  # noqa: E402
+from fastapi_rf.responses import FastJSONResponse  # noqa: E402
+from fastapi_rf.serializers import BaseSchemaModel  # noqa: E402
+
+
+class ItemRead(BaseSchemaModel):
+    id: int
+    name: str
+    price: float
+    description: str | None
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+
+
+def make_rows(n):
+    now = datetime.datetime.utcnow()
+    return [
+        SimpleNamespace(id=i, name=f"item {i}", price=i * 1.5, description="x" * 32, created_at=now, updated_at=now)
+        for i in range(n)
+    ]
+
+
+async def default_path(field, content):
+    content = await serialize_response(field=field, response_content=content)
+    return JSONResponse(content).body
+
+
+async def fast_path(field, content):
+    content, errors = field.validate(content, {}, loc=("response",))
+    assert not errors
+    return FastJSONResponse(content).body
+
+
+async def bench(func, field, content, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await func(field, content)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def main():
+    schema = LimitOffsetPagination.get_paginated_return_type(ItemRead)
+    field = create_response_field(name="Response_list", type_=schema)
+    print(f"{'rows':>8} {'default ms':>12} {'fast ms':>10} {'speedup':>8}")
+    for n, repeat in ((1000, 20), (10000, 5)):
+        content = {"total": n, "total_mode": "exact", "limit": n, "offset": 0, "results": make_rows(n)}
+        assert (await default_path(field, content)) == (await fast_path(field, content))
+        default = await bench(default_path, field, content, repeat)
+        fast = await bench(fast_path, field, content, repeat)
+        print(f"{n:>8} {default * 1000:>12.1f} {fast * 1000:>10.1f} {default / fast:>7.1f}x")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
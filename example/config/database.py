@@ -1,18 +1,81 @@
+from functools import partial
+
 from sqlalchemy.orm import sessionmaker
 from .settings import DATABASE as _DB
 from sqlalchemy.future.engine import Engine
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool, StaticPool
+
+from fastapi_rf.database import MeteredQueuePool, RoutingSession, StickyWrites
 
 
 class Database:
     url: str
     engine: Engine
 
-    def __init__(self, url, connect_args=None, **kwargs) -> None:
+    def __init__(self, url, connect_args=None, pool_size=5, max_overflow=10, pool_pre_ping=True,
+                 pool_recycle=3600, pool_timeout=30, replicas=None, sticky_seconds=0, **kwargs) -> None:
         self.url = url
-        self.engine = create_async_engine(url, connect_args=connect_args, future=True)
-        self.SessionLocal = sessionmaker(self.engine, autoflush=False, class_=AsyncSession)
+        engine_kwargs = dict(
+            connect_args=connect_args or {},
+            pool_pre_ping=pool_pre_ping,
+            pool_recycle=pool_recycle,
+            future=True,
+            **kwargs
+        )
+        queue_pool_kwargs = dict(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout)
+        # engine 与 SessionLocal 进程内只创建一次，所有请求复用同一个连接池
+        self.engine = self.create_engine(url, engine_kwargs, queue_pool_kwargs)
+        # 只读库，GET 等安全方法的查询会路由到这里
+        self.replicas = [
+            self.create_engine(replica_url, engine_kwargs, queue_pool_kwargs) for replica_url in replicas or []
+        ]
+        # 写入后 sticky_seconds 秒内，同一客户端的读取仍走主库，0 表示关闭
+        self.sticky = StickyWrites(sticky_seconds) if sticky_seconds else None
+        self.SessionLocal = sessionmaker(
+            self.engine, autoflush=False, class_=AsyncSession, sync_session_class=RoutingSession,
+            info={'replicas': [replica.sync_engine for replica in self.replicas]}
+        )
+
+    @staticmethod
+    def create_engine(url, engine_kwargs, queue_pool_kwargs):
+        kwargs = dict(engine_kwargs)
+        poolclass = kwargs.get('poolclass')
+        if poolclass is None:
+            # sqlite 内存数据库每个连接是一个独立的库，只能使用一个连接
+            url_obj = make_url(url)
+            memory = url_obj.get_backend_name() == 'sqlite' and url_obj.database in (None, '', ':memory:')
+            poolclass = kwargs['poolclass'] = StaticPool if memory else MeteredQueuePool
+        # pool_size 等参数只有 QueuePool 支持，NullPool、StaticPool 等传入会报错
+        if issubclass(poolclass, QueuePool):
+            kwargs.update(queue_pool_kwargs)
+        return create_async_engine(url, **kwargs)
+
+    def get_session_factory(self, read_only=False, sticky_key=None):
+        if not read_only or not self.replicas:
+            return self.SessionLocal
+        if self.sticky is not None and sticky_key is not None and self.sticky.is_sticky(sticky_key):
+            return self.SessionLocal
+        return partial(self.SessionLocal, info={'use_replica': True})
+
+    def mark_write(self, sticky_key):
+        if self.sticky is not None and sticky_key is not None:
+            self.sticky.mark(sticky_key)
+
+    def pool_metrics(self) -> dict:
+        ret = self._pool_metrics(self.engine)
+        if self.replicas:
+            ret['replicas'] = [self._pool_metrics(replica) for replica in self.replicas]
+        return ret
+
+    @staticmethod
+    def _pool_metrics(engine) -> dict:
+        pool = engine.pool
+        if isinstance(pool, MeteredQueuePool):
+            return pool.snapshot()
+        return {"status": pool.status()}
 
 
 DATABASE = Database(**_DB)
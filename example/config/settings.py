@@ -6,7 +6,18 @@ DATABASE = {
     "url": "sqlite+aiosqlite:///db.sqlite",
     "connect_args": {
         "check_same_thread": False
-    }
+    },
+    # 连接池配置
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_pre_ping": True,
+    "pool_recycle": 3600,
+    # 只读库，GET 请求的查询会路由到只读库
+    "replicas": [
+        # "sqlite+aiosqlite:///db_replica.sqlite",
+    ],
+    # 写入后多少秒内同一客户端的读取仍走主库（read-your-writes），0 表示关闭
+    "sticky_seconds": 0,
 }
 # for keto
 KETO_MAX_INDIRECTION_DEPTH = 32
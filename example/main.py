@@ -23,6 +23,11 @@ def index() -> IndexResp:
     return {"service": 'ez-admin'}
 
 
+@app.get('/metrics/database')
+def database_metrics() -> dict:
+    return DATABASE.pool_metrics()
+
+
 @app.on_event("startup")
 async def init_database():
     async with DATABASE.engine.begin() as conn:
@@ -1,15 +1,33 @@
 import pytest
 from fastapi.testclient import TestClient
 
-from main import app
-
 
 @pytest.fixture(scope='function')
 def client():
+    # 在 fixture 中导入，main 导入失败时不影响其他测试的收集
+    from main import app
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture(scope='function')
+def rf_client():
+    from .viewsets import app
     with TestClient(app) as c:
         yield c
 
 
+@pytest.fixture()
+def create_items(rf_client):
+    def create(*items, owner=None):
+        headers = {'X-Owner': owner} if owner else {}
+        response = rf_client.post('/rf/items/batch_create/', json=list(items), headers=headers)
+        assert response.status_code == 200
+        return response.json()
+
+    return create
+
+
 @pytest.fixture(scope='function')
 def user(client):
     response = client.post('/user/account/register/', json={
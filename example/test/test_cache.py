@@ -0,0 +1,99 @@
+import asyncio
+import enum
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+
+from fastapi_rf.cache import RedisObjectCache, dumps_values, loads_values
+
+pytest.importorskip('redis')
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def hset(self, name, key, value):
+        self.commands.append(('hset', name, key, value))
+
+    def pexpire(self, name, milliseconds):
+        self.commands.append(('pexpire', name, milliseconds))
+
+    async def execute(self):
+        for command, name, *args in self.commands:
+            if command == 'hset':
+                self.client.data.setdefault(name, {})[args[0]] = args[1]
+            else:
+                self.client.expires[name] = args[0]
+
+
+class FakeRedis:
+    """
+    只实现 RedisObjectCache 用到的命令
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+
+    async def hget(self, name, key):
+        return self.data.get(name, {}).get(key)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def delete(self, *names):
+        for name in names:
+            self.data.pop(name, None)
+
+
+def test_redis_object_cache():
+    client = FakeRedis()
+    cache = RedisObjectCache(client, ttl=0.5)
+    value = {
+        'id': 1, 'name': '中文', 'created_at': datetime(2020, 1, 1, 8), 'day': date(2020, 1, 2),
+        'price': Decimal('1.10'), 'uid': uuid4(), 'data': b'\x00\x01', 'extra': {'a': [1]}, 'owner': None,
+    }
+
+    async def run():
+        await cache.set('RFItem:1', 'scope', value)
+        assert await cache.get('RFItem:1', 'scope') == value
+        assert await cache.get('RFItem:1', 'other') is None
+        await cache.delete('RFItem:1')
+        assert await cache.get('RFItem:1', 'scope') is None
+
+    asyncio.run(run())
+    # ttl 小于 1 秒时按毫秒设置过期时间
+    assert client.expires == {'fastapi_rf:object:RFItem:1': 500}
+
+
+def test_redis_object_cache_unsupported_type():
+    class Color(enum.Enum):
+        red = 'red'
+
+    client = FakeRedis()
+    cache = RedisObjectCache(client)
+
+    async def run():
+        # 无法按 json 编码的对象不缓存
+        await cache.set('RFItem:1', 'scope', {'id': 1, 'color': Color.red})
+        assert await cache.get('RFItem:1', 'scope') is None
+
+    asyncio.run(run())
+    assert client.data == {}
+
+
+def test_dumps_values_is_json():
+    # 存储格式是 json，读取时不会执行代码
+    data = dumps_values({'at': datetime(2020, 1, 1)})
+    assert data == b'{"values": {"at": "2020-01-01T00:00:00"}, "types": {"at": "datetime"}}'
+    assert loads_values(data) == {'at': datetime(2020, 1, 1)}
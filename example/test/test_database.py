@@ -0,0 +1,203 @@
+import asyncio
+
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.pool import NullPool, StaticPool
+
+from config.database import Database
+from fastapi_rf.database import LazySession, MeteredQueuePool, add_after_commit, commit
+from .viewsets import RFBase, RFItem
+
+
+@pytest.fixture()
+def database(tmp_path):
+    database = Database(f"sqlite+aiosqlite:///{tmp_path / 'primary.sqlite'}")
+
+    async def init():
+        async with database.engine.begin() as conn:
+            await conn.run_sync(RFBase.metadata.create_all)
+            await conn.execute(insert(RFItem).values(name='primary'))
+
+    asyncio.run(init())
+    yield database
+    asyncio.run(database.engine.dispose())
+
+
+async def read_name(session):
+    return await session.scalar(select(RFItem.name).order_by(RFItem.id))
+
+
+def test_session_factory_reused(database):
+    # 所有请求复用进程级的 SessionLocal 与连接池
+    assert database.get_session_factory() is database.SessionLocal
+    assert database.get_session_factory(read_only=True) is database.SessionLocal
+    assert isinstance(database.engine.pool, MeteredQueuePool)
+
+
+def test_pool_metrics(database):
+    async def run():
+        async with database.SessionLocal() as session:
+            assert await read_name(session) == 'primary'
+            metrics = database.pool_metrics()
+            assert (metrics['checked_out'], metrics['saturation']) == (1, 1 / 15)
+        return database.pool_metrics()
+
+    metrics = asyncio.run(run())
+    assert (metrics['pool_size'], metrics['max_overflow']) == (5, 10)
+    assert (metrics['checked_out'], metrics['checked_in']) == (0, 1)
+    assert metrics['checkouts'] >= 2
+    assert metrics['wait_seconds_max'] >= metrics['wait_seconds_avg'] >= 0
+
+
+def test_null_pool(tmp_path):
+    # NullPool 不支持 pool_size 等参数，不传入
+    database = Database(f"sqlite+aiosqlite:///{tmp_path / 'primary.sqlite'}", poolclass=NullPool)
+
+    async def run():
+        async with database.SessionLocal() as session:
+            assert await session.scalar(select(1)) == 1
+        await database.engine.dispose()
+
+    asyncio.run(run())
+    assert isinstance(database.engine.pool, NullPool)
+    assert 'status' in database.pool_metrics()
+
+
+def test_memory_database():
+    # 内存数据库使用 StaticPool，所有 session 访问同一个库
+    database = Database('sqlite+aiosqlite:///:memory:')
+
+    async def run():
+        async with database.engine.begin() as conn:
+            await conn.run_sync(RFBase.metadata.create_all)
+        async with database.SessionLocal() as session:
+            session.add(RFItem(name='memory'))
+            await session.commit()
+        async with database.SessionLocal() as session:
+            assert await read_name(session) == 'memory'
+        await database.engine.dispose()
+
+    asyncio.run(run())
+    assert isinstance(database.engine.pool, StaticPool)
+
+
+def test_lazy_session(database):
+    async def run():
+        db = LazySession(database.SessionLocal)
+        # 未访问时不创建 session
+        assert db._session is None and not db.has_writes
+        await read_name(db)
+        assert not db.has_writes
+        db.add(RFItem(name='new'))
+        await db.flush()
+        assert db.has_writes
+        await db.commit()
+        assert not db.has_writes and db.has_committed_writes
+        await db.close()
+
+    asyncio.run(run())
+
+
+def test_lazy_session_unused(database):
+    async def run():
+        db = LazySession(database.SessionLocal)
+        await db.close()
+        assert db._session is None
+
+    asyncio.run(run())
+    # 未使用的 session 不从连接池取连接
+    assert database.pool_metrics()['checkouts'] == 1
+
+
+@pytest.fixture()
+def replica_database(tmp_path):
+    database = Database(
+        f"sqlite+aiosqlite:///{tmp_path / 'primary.sqlite'}",
+        replicas=[f"sqlite+aiosqlite:///{tmp_path / 'replica.sqlite'}"],
+        sticky_seconds=60,
+    )
+
+    async def init():
+        # 主库与只读库写入不同的数据，用来区分查询走了哪个库
+        for engine, name in ((database.engine, 'primary'), (database.replicas[0], 'replica')):
+            async with engine.begin() as conn:
+                await conn.run_sync(RFBase.metadata.create_all)
+                await conn.execute(insert(RFItem).values(name=name))
+
+    asyncio.run(init())
+    yield database
+
+    async def dispose():
+        await database.engine.dispose()
+        for replica in database.replicas:
+            await replica.dispose()
+
+    asyncio.run(dispose())
+
+
+def test_replica_routing(replica_database):
+    async def run():
+        async with replica_database.get_session_factory(read_only=True)() as session:
+            assert await read_name(session) == 'replica'
+        async with replica_database.get_session_factory(read_only=False)() as session:
+            assert await read_name(session) == 'primary'
+
+    asyncio.run(run())
+
+
+def test_replica_routing_after_write(replica_database):
+    async def run():
+        async with replica_database.get_session_factory(read_only=True)() as session:
+            assert await read_name(session) == 'replica'
+            session.add(RFItem(name='new'))
+            await session.flush()
+            # 写操作之后的读取走主库，能读到未提交的数据
+            assert await session.scalar(select(RFItem.id).where(RFItem.name == 'new')) is not None
+            assert await read_name(session) == 'primary'
+
+    asyncio.run(run())
+
+
+def test_sticky_writes(replica_database):
+    async def run():
+        replica_database.mark_write('alice')
+        async with replica_database.get_session_factory(read_only=True, sticky_key='alice')() as session:
+            assert await read_name(session) == 'primary'
+        async with replica_database.get_session_factory(read_only=True, sticky_key='bob')() as session:
+            assert await read_name(session) == 'replica'
+
+    asyncio.run(run())
+
+
+def test_sticky_writes_expire(replica_database, monkeypatch):
+    replica_database.mark_write('alice')
+    assert replica_database.sticky.is_sticky('alice')
+    monkeypatch.setattr(replica_database.sticky, 'seconds', 0)
+    assert not replica_database.sticky.is_sticky('alice')
+    assert replica_database.get_session_factory(read_only=True, sticky_key='alice') is not replica_database.SessionLocal
+
+
+def test_replica_pool_metrics(replica_database):
+    assert len(replica_database.pool_metrics()['replicas']) == 1
+
+
+def test_after_commit(database):
+    async def run():
+        calls = []
+
+        async def callback():
+            calls.append('called')
+
+        async with database.SessionLocal() as session:
+            await read_name(session)
+            add_after_commit(session, callback)
+            await session.rollback()
+            await commit(session)
+            # 回滚时丢弃
+            assert calls == []
+            add_after_commit(session, callback)
+            assert calls == []
+            await commit(session)
+            assert calls == ['called']
+
+    asyncio.run(run())
@@ -0,0 +1,346 @@
+import asyncio
+import csv
+import io
+import json
+
+import pytest
+from fastapi import APIRouter
+from fastapi.testclient import TestClient
+
+from config.database import DATABASE, Database
+from fastapi_rf.core import GenericViewSet
+from fastapi_rf.mixin import UpsertMixin
+from .viewsets import ItemRead, ItemViewSet, ItemWrite, RFBase, RFCategory, RFItem
+
+
+def test_list_stream(rf_client, create_items):
+    create_items(*({'name': f'item {i}'} for i in range(5)))
+    resp = rf_client.get('/rf/stream_items/')
+    assert resp.headers['content-type'] == 'application/x-ndjson'
+    lines = resp.text.splitlines()
+    assert [json.loads(line)['name'] for line in lines] == [f'item {i}' for i in range(5)]
+
+
+def test_export(rf_client, create_items):
+    create_items({'name': 'a, b', 'price': 1})
+    create_items({'name': 'c'}, owner='bob')
+    resp = rf_client.get('/rf/export_items/export/')
+    assert resp.headers['content-type'].startswith('text/csv')
+    assert resp.content.startswith('\ufeff'.encode())
+    rows = list(csv.reader(io.StringIO(resp.content.decode('utf-8-sig'))))
+    assert rows == [['id', 'name', 'price', 'owner'], ['1', 'a, b', '1', ''], ['2', 'c', '0', 'bob']]
+    # 按 get_queryset 的范围导出
+    resp = rf_client.get('/rf/export_items/export/', headers={'X-Owner': 'bob'})
+    assert len(list(csv.reader(io.StringIO(resp.content.decode('utf-8-sig'))))) == 2
+
+
+def test_export_nested_fields(rf_client, create_items):
+    rf_client.post('/rf/categories/', json={'name': '分类'})
+    create_items({'name': 'a', 'category_id': 1}, {'name': 'b'})
+    resp = rf_client.get('/rf/category_export_items/export/')
+    rows = list(csv.reader(io.StringIO(resp.content.decode('utf-8-sig'))))
+    assert rows[0] == ['id', 'name', 'price', 'owner', 'category']
+    assert json.loads(rows[1][4]) == {'id': 1, 'name': '分类'}
+    assert rows[2][4] == ''
+
+
+def test_list_columnar(rf_client, create_items):
+    create_items({'name': 'a', 'price': 1}, {'name': 'b', 'price': 2})
+    resp = rf_client.get('/rf/items/', params={'format': 'columnar'})
+    assert resp.json() == {
+        'columns': ['id', 'name', 'price', 'owner'],
+        'data': {'id': [1, 2], 'name': ['a', 'b'], 'price': [1, 2], 'owner': ['', '']}
+    }
+
+
+def test_list_columnar_paginated(rf_client, create_items):
+    create_items({'name': 'a', 'price': 1}, {'name': 'b', 'price': 2})
+    resp = rf_client.get('/rf/paged_items/', params={'format': 'columnar', 'limit': 1, 'offset': 1}).json()
+    assert resp['total'] == 2
+    assert resp['results'] == {'columns': ['id', 'name', 'price', 'owner'], 'data': {
+        'id': [2], 'name': ['b'], 'price': [2], 'owner': ['']
+    }}
+
+
+def test_batch_create(rf_client, create_items):
+    ret = create_items(*({'name': f'item {i}', 'price': i} for i in range(5)))
+    # 按请求的顺序返回
+    assert [(item['name'], item['price']) for item in ret] == [(f'item {i}', i) for i in range(5)]
+    assert [item['id'] for item in ret] == sorted(item['id'] for item in ret)
+    assert len(rf_client.get('/rf/items/').json()) == 5
+
+
+def test_batch_create_extra_info(rf_client, create_items):
+    ret = create_items({'name': 'a'}, {'name': 'b'}, owner='alice')
+    assert [item['owner'] for item in ret] == ['alice', 'alice']
+
+
+def test_batch_create_chunks(rf_client, create_items, monkeypatch):
+    monkeypatch.setattr(ItemViewSet, 'bulk_insert_chunk_size', 2)
+    ret = create_items(*({'name': f'item {i}'} for i in range(5)))
+    assert [item['name'] for item in ret] == [f'item {i}' for i in range(5)]
+
+
+def run_bulk_insert(tmp_path, make_rows):
+    database = Database(f"sqlite+aiosqlite:///{tmp_path / 'bulk.sqlite'}")
+
+    async def run():
+        async with database.engine.begin() as conn:
+            await conn.run_sync(RFBase.metadata.create_all)
+        async with database.SessionLocal() as session:
+            instances = await ItemViewSet(db=session).bulk_insert(make_rows())
+            ret = [(instance.id, instance.name, instance.category_id) for instance in instances]
+        await database.engine.dispose()
+        return ret
+
+    return asyncio.run(run())
+
+
+def test_bulk_insert_explicit_pks(tmp_path):
+    # 指定主键时按 rows 的顺序返回，而不是按主键排序
+    ret = run_bulk_insert(tmp_path, lambda: [{'id': 10, 'name': 'a'}, {'id': 5, 'name': 'b'}, {'id': 7, 'name': 'c'}])
+    assert ret == [(10, 'a', None), (5, 'b', None), (7, 'c', None)]
+
+
+def test_bulk_insert_relationship_keys(tmp_path):
+    # rows 中有关系等非列的键时使用 add_all
+    def make_rows():
+        category = RFCategory(name='c')
+        return [{'name': 'a', 'category': category}, {'name': 'b'}]
+
+    assert run_bulk_insert(tmp_path, make_rows) == [(1, 'a', 1), (2, 'b', None)]
+
+
+def ingest(client: TestClient, body: bytes):
+    # 分成小块发送，覆盖记录跨块的情况
+    def chunks():
+        for i in range(0, len(body), 7):
+            yield body[i:i + 7]
+
+    resp = client.post('/rf/ingest_items/ingest/', content=chunks())
+    assert resp.status_code == 200
+    return resp.json()
+
+
+def test_ingest_ndjson(rf_client):
+    body = '\n'.join([
+        json.dumps({'name': '物品 0', 'price': 0}),
+        json.dumps({'name': 'item 1'}),
+        '{bad json',
+        json.dumps({'price': 3}),
+        json.dumps({'name': 'item 4'}),
+    ]).encode()
+    ret = ingest(rf_client, body)
+    assert (ret['total'], ret['inserted'], ret['failed']) == (5, 3, 2)
+    assert [error['index'] for error in ret['errors']] == [2, 3]
+    assert [(chunk['start'], chunk['end']) for chunk in ret['chunks']] == [(0, 1), (2, 3), (4, 4)]
+    assert [item['name'] for item in rf_client.get('/rf/items/').json()] == ['物品 0', 'item 1', 'item 4']
+
+
+def test_ingest_array(rf_client):
+    body = json.dumps([{'name': f'item {i}', 'price': i} for i in range(5)]).encode()
+    ret = ingest(rf_client, body)
+    assert (ret['total'], ret['inserted'], ret['failed'], ret['error']) == (5, 5, 0, None)
+    assert len(rf_client.get('/rf/items/').json()) == 5
+
+
+def test_ingest_array_trailing_data(rf_client):
+    ret = ingest(rf_client, b'[{"name": "a"}, {"name": "b"}] x')
+    assert ret['error'] == 'unexpected data after json array'
+    # 错误之前的记录仍然导入
+    assert ret['inserted'] == 2
+
+
+def test_ingest_array_truncated(rf_client):
+    ret = ingest(rf_client, b'[{"name": "a"}, {"name": "b"}, {"name": ')
+    assert ret['error'] == 'unexpected end of json array at record 2'
+    assert ret['inserted'] == 2
+
+
+def test_ingest_array_invalid_element(rf_client):
+    # 中间的元素格式错误时立即报错，不把剩余的请求体当作不完整的元素缓存
+    body = b'[{"name": "a", "price": 1.5e1}, {"name": tru}, ' + b'{"name": "x"}, ' * 100 + b']'
+    ret = ingest(rf_client, body)
+    assert ret['error'].startswith('invalid json at record 1: ')
+    assert (ret['total'], ret['inserted']) == (1, 1)
+
+
+def test_ingest_openapi(rf_client):
+    request_body = rf_client.get('/openapi.json').json()['paths']['/rf/ingest_items/ingest/']['post']['requestBody']
+    assert set(request_body['content']) == {'application/x-ndjson', 'application/json'}
+
+
+def test_ingest_chunk_failure(rf_client, create_items):
+    create_items({'name': 'a'})
+    body = b'\n'.join(json.dumps({'name': name}).encode() for name in ['b', 'a', 'c'])
+    ret = ingest(rf_client, body)
+    # 第一批违反唯一约束，回滚后继续处理下一批
+    assert ret['chunks'][0]['inserted'] == 0 and ret['chunks'][0]['error']
+    assert ret['chunks'][1]['inserted'] == 1
+    assert [item['name'] for item in rf_client.get('/rf/items/').json()] == ['a', 'c']
+
+
+def test_ingest_extra_info(rf_client):
+    def chunks():
+        yield b'{"name": "a"}\n'
+
+    resp = rf_client.post('/rf/ingest_items/ingest/', content=chunks(), headers={'X-Owner': 'alice'})
+    assert resp.json()['inserted'] == 1
+    assert rf_client.get('/rf/items/1/').json()['owner'] == 'alice'
+
+
+def test_batch_update(rf_client, create_items):
+    a, b = create_items({'name': 'a', 'price': 1}, {'name': 'b', 'price': 2})
+    resp = rf_client.post('/rf/batch_update_items/batch_update/', json=[
+        {'id': b['id'], 'price': 20},
+        {'id': a['id'], 'name': 'aa'},
+    ])
+    assert resp.status_code == 200
+    assert [(item['name'], item['price']) for item in resp.json()] == [('b', 20), ('aa', 1)]
+    # 主键必填
+    assert rf_client.post('/rf/batch_update_items/batch_update/', json=[{'price': 1}]).status_code == 422
+
+
+def test_batch_update_duplicate_pks(rf_client, create_items):
+    a, = create_items({'name': 'a', 'price': 1})
+    # 同一主键的修改按请求顺序合并
+    resp = rf_client.post('/rf/batch_update_items/batch_update/', json=[
+        {'id': a['id'], 'price': 10},
+        {'id': a['id'], 'name': 'aa', 'price': 20},
+        {'id': a['id'], 'price': 30},
+    ])
+    assert resp.status_code == 200
+    assert [(item['name'], item['price']) for item in resp.json()] == [('aa', 30)] * 3
+    assert rf_client.get(f"/rf/items/{a['id']}/").json()['price'] == 30
+
+
+def test_batch_update_max_items(rf_client, create_items):
+    from .viewsets import BatchUpdateItemViewSet
+    a, = create_items({'name': 'a', 'price': 1})
+    body = [{'id': a['id'], 'price': i} for i in range(BatchUpdateItemViewSet.batch_update_max_items + 1)]
+    assert rf_client.post('/rf/batch_update_items/batch_update/', json=body).status_code == 422
+
+
+def test_batch_update_scope(rf_client, create_items):
+    a, = create_items({'name': 'a', 'price': 1}, owner='alice')
+    b, = create_items({'name': 'b', 'price': 2}, owner='bob')
+    resp = rf_client.post('/rf/batch_update_items/batch_update/', json=[
+        {'id': a['id'], 'price': 10},
+        {'id': b['id'], 'price': 20},
+    ], headers={'X-Owner': 'alice'})
+    assert resp.status_code == 400
+    # 整个请求失败，范围内的记录也不更新
+    items = {item['name']: item['price'] for item in rf_client.get('/rf/items/').json()}
+    assert items == {'a': 1, 'b': 2}
+
+
+def test_batch_destroy(rf_client, create_items):
+    items = create_items(*({'name': f'item {i}'} for i in range(5)))
+    resp = rf_client.post('/rf/batch_destroy_items/batch_destroy/', json={'pks': [item['id'] for item in items[:3]]})
+    assert resp.status_code == 204
+    assert [item['name'] for item in rf_client.get('/rf/items/').json()] == ['item 3', 'item 4']
+
+
+def test_batch_destroy_scope(rf_client, create_items):
+    a, = create_items({'name': 'a'}, owner='alice')
+    b, = create_items({'name': 'b'}, owner='bob')
+    resp = rf_client.post(
+        '/rf/batch_destroy_items/batch_destroy/', json={'pks': [a['id'], b['id']]}, headers={'X-Owner': 'alice'}
+    )
+    assert resp.status_code == 204
+    assert [item['name'] for item in rf_client.get('/rf/items/').json()] == ['b']
+
+
+def test_batch_destroy_background(rf_client, create_items, monkeypatch):
+    from .viewsets import BatchDestroyItemViewSet
+    monkeypatch.setattr(BatchDestroyItemViewSet, 'batch_destroy_background_threshold', 2)
+    items = create_items(*({'name': f'item {i}'} for i in range(5)))
+    resp = rf_client.post('/rf/batch_destroy_items/batch_destroy/', json={'pks': [item['id'] for item in items[:4]]})
+    assert resp.status_code == 202
+    # TestClient 在返回响应前执行完后台任务
+    assert [item['name'] for item in rf_client.get('/rf/items/').json()] == ['item 4']
+
+
+def test_batch_destroy_max_items(rf_client):
+    from .viewsets import BatchDestroyItemViewSet
+    resp = rf_client.post(
+        '/rf/batch_destroy_items/batch_destroy/',
+        json={'pks': list(range(BatchDestroyItemViewSet.batch_destroy_max_items + 1))}
+    )
+    assert resp.status_code == 422
+
+
+def test_upsert(rf_client, create_items):
+    create_items({'name': 'a', 'price': 1})
+    resp = rf_client.post('/rf/upsert_items/upsert/', json=[
+        {'name': 'a', 'price': 10},
+        {'name': 'b', 'price': 2},
+        {'name': 'b', 'price': 3},
+    ])
+    assert resp.status_code == 200
+    assert resp.json() == {'inserted': 1, 'updated': 1}
+    items = {item['name']: item['price'] for item in rf_client.get('/rf/items/').json()}
+    assert items == {'a': 10, 'b': 3}
+
+
+def test_upsert_scope(rf_client, create_items):
+    create_items({'name': 'a', 'price': 1}, owner='bob')
+    resp = rf_client.post('/rf/upsert_items/upsert/', json=[
+        {'name': 'a', 'price': 10},
+        {'name': 'c', 'price': 3},
+    ], headers={'X-Owner': 'alice'})
+    assert resp.status_code == 400
+    items = {item['name']: (item['price'], item['owner']) for item in rf_client.get('/rf/items/').json()}
+    assert items == {'a': (1, 'bob')}
+
+
+def test_upsert_conflict_fields_missing(rf_client, monkeypatch):
+    from .viewsets import UpsertItemViewSet
+    # 冲突键不在 serializer_write 中，也不由 get_create_extra_info 提供
+    monkeypatch.setattr(UpsertItemViewSet, 'upsert_conflict_fields', ('id',))
+    resp = rf_client.post('/rf/upsert_items/upsert/', json=[{'name': 'a'}])
+    assert resp.status_code == 400
+
+
+def test_upsert_unsupported_dialect(rf_client, monkeypatch):
+    monkeypatch.setattr(DATABASE.engine.dialect, 'name', 'oracle')
+    resp = rf_client.post('/rf/upsert_items/upsert/', json=[{'name': 'a'}])
+    assert resp.status_code == 501
+
+
+def test_upsert_conflict_fields_required():
+    class MissingConflictFieldsViewSet(UpsertMixin, GenericViewSet):
+        model = RFItem
+        serializer_read = ItemRead
+        serializer_write = ItemWrite
+
+    class InvalidConflictFieldsViewSet(MissingConflictFieldsViewSet):
+        upsert_conflict_fields = ('category',)
+
+    for viewset in (MissingConflictFieldsViewSet, InvalidConflictFieldsViewSet):
+        with pytest.raises(ValueError):
+            viewset.register(APIRouter(), 'items')
+
+
+def test_bulk_retrieve(rf_client, create_items):
+    a, b = create_items({'name': 'a'}, {'name': 'b'})
+    resp = rf_client.get('/rf/bulk_items/bulk/', params={'ids': f"{b['id']},100,{a['id']},{b['id']}"})
+    assert resp.status_code == 200
+    assert [item['name'] for item in resp.json()['results']] == ['b', 'a']
+    assert resp.json()['missing'] == [100]
+    assert rf_client.get('/rf/bulk_items/bulk/', params={'ids': 'x'}).status_code == 400
+
+
+def test_bulk_retrieve_scope(rf_client, create_items):
+    a, = create_items({'name': 'a'}, owner='alice')
+    b, = create_items({'name': 'b'}, owner='bob')
+    resp = rf_client.get('/rf/bulk_items/bulk/', params={'ids': f"{a['id']},{b['id']}"}, headers={'X-Owner': 'alice'})
+    assert [item['name'] for item in resp.json()['results']] == ['a']
+    assert resp.json()['missing'] == [b['id']]
+
+
+def test_bulk_retrieve_max_ids(rf_client, monkeypatch):
+    from .viewsets import BulkRetrieveItemViewSet
+    monkeypatch.setattr(BulkRetrieveItemViewSet, 'bulk_retrieve_max_ids', 2)
+    assert rf_client.get('/rf/bulk_items/bulk/', params={'ids': '1,2,3'}).status_code == 400
+    assert rf_client.get('/rf/bulk_items/bulk/', params={'ids': '1,2,2'}).status_code == 200
@@ -0,0 +1,124 @@
+import pytest
+
+from fastapi_rf.pagination import BasePagination
+
+
+@pytest.fixture()
+def items(rf_client, create_items):
+    # 价格有重复，游标需要用主键区分
+    return create_items(*({'name': f'item {i}', 'price': i // 2} for i in range(7)))
+
+
+def names(resp):
+    return [item['name'] for item in resp.json()['results']]
+
+
+def test_cursor_pagination(rf_client, items):
+    # order_by = '-price'，价格相同时按主键升序
+    expected = ['item 6', 'item 4', 'item 5', 'item 2', 'item 3', 'item 0', 'item 1']
+    pages = []
+    resp = rf_client.get('/rf/cursor_items/', params={'page_size': 3})
+    assert resp.json()['previous'] is None
+    while True:
+        pages.append(names(resp))
+        cursor = resp.json()['next']
+        if cursor is None:
+            break
+        resp = rf_client.get('/rf/cursor_items/', params={'page_size': 3, 'cursor': cursor})
+    assert pages == [expected[:3], expected[3:6], expected[6:]]
+
+    # 从最后一页向前翻
+    pages = [names(resp)]
+    while resp.json()['previous'] is not None:
+        resp = rf_client.get('/rf/cursor_items/', params={'page_size': 3, 'cursor': resp.json()['previous']})
+        pages.append(names(resp))
+    assert pages == [expected[6:], expected[3:6], expected[:3]]
+    assert resp.json()['next'] is not None
+
+
+def test_cursor_pagination_insert_between_pages(rf_client, create_items, items):
+    first = rf_client.get('/rf/cursor_items/', params={'page_size': 3}).json()
+    # 插入到第一页中，不影响第二页
+    create_items({'name': 'new', 'price': 3})
+    resp = rf_client.get('/rf/cursor_items/', params={'page_size': 3, 'cursor': first['next']})
+    assert names(resp) == ['item 2', 'item 3', 'item 0']
+
+
+def test_cursor_pagination_invalid_cursor(rf_client, items):
+    assert rf_client.get('/rf/cursor_items/', params={'cursor': 'invalid'}).status_code == 400
+
+
+def test_count_exact(rf_client, items):
+    resp = rf_client.get('/rf/paged_items/', params={'limit': 2, 'offset': 2}).json()
+    assert (resp['total'], resp['total_mode']) == (7, 'exact')
+    assert [item['name'] for item in resp['results']] == ['item 2', 'item 3']
+
+
+def test_count_none(rf_client, items):
+    resp = rf_client.get('/rf/uncounted_items/', params={'limit': 2}).json()
+    assert (resp['total'], resp['total_mode']) == (None, 'none')
+    assert len(resp['results']) == 2
+
+
+def test_count_cached(rf_client, create_items, items):
+    resp = rf_client.get('/rf/cached_count_items/', params={'limit': 2}).json()
+    assert (resp['total'], resp['total_mode']) == (7, 'exact')
+    create_items({'name': 'new'})
+    # 缓存期内返回缓存的总数，翻页参数不影响缓存
+    resp = rf_client.get('/rf/cached_count_items/', params={'limit': 2, 'offset': 2}).json()
+    assert (resp['total'], resp['total_mode']) == (7, 'cached')
+
+
+def test_count_estimate(rf_client, items, monkeypatch):
+    # sqlite 不支持估算，精确统计
+    resp = rf_client.get('/rf/estimated_items/', params={'limit': 2}).json()
+    assert (resp['total'], resp['total_mode']) == (7, 'exact')
+
+    async def estimate_count(self, qs):
+        return estimate
+
+    monkeypatch.setattr(BasePagination, 'estimate_count', estimate_count)
+    # 估算值不超过 pagination_count_threshold 时仍精确统计
+    estimate = 50
+    resp = rf_client.get('/rf/estimated_items/', params={'limit': 2}).json()
+    assert (resp['total'], resp['total_mode']) == (7, 'exact')
+    estimate = 5000
+    resp = rf_client.get('/rf/estimated_items/', params={'limit': 2}).json()
+    assert (resp['total'], resp['total_mode']) == (5000, 'estimate')
+
+
+def test_page_size_count_none(rf_client, items):
+    resp = rf_client.get('/rf/page_size_items/', params={'page_num': 2, 'page_size': 3}).json()
+    assert (resp['total'], resp['total_mode'], resp['page_num']) == (None, 'none', 2)
+    assert [item['name'] for item in resp['results']] == ['item 3', 'item 4', 'item 5']
+
+
+def test_count_window(rf_client, items):
+    resp = rf_client.get('/rf/window_items/', params={'limit': 2, 'offset': 4}).json()
+    assert (resp['total'], resp['total_mode']) == (7, 'window')
+    assert [item['name'] for item in resp['results']] == ['item 4', 'item 5']
+
+
+def test_count_window_out_of_range(rf_client, items):
+    # 页码超出范围时没有返回行，退回 count 查询
+    resp = rf_client.get('/rf/window_items/', params={'limit': 2, 'offset': 10}).json()
+    assert (resp['total'], resp['total_mode'], resp['results']) == (7, 'exact', [])
+
+
+def test_count_window_empty(rf_client):
+    resp = rf_client.get('/rf/window_items/').json()
+    assert (resp['total'], resp['total_mode'], resp['results']) == (0, 'window', [])
+
+
+def test_page_size_count_window(rf_client, items):
+    resp = rf_client.get('/rf/page_size_window_items/', params={'page_num': 3, 'page_size': 3}).json()
+    assert (resp['total'], resp['total_mode']) == (7, 'window')
+    assert [item['name'] for item in resp['results']] == ['item 6']
+    resp = rf_client.get('/rf/page_size_window_items/', params={'page_num': 4, 'page_size': 3}).json()
+    assert (resp['total'], resp['total_mode'], resp['results']) == (7, 'exact', [])
+
+
+def test_deferred_join(rf_client, items):
+    resp = rf_client.get('/rf/deferred_items/', params={'limit': 3, 'offset': 3}).json()
+    assert resp['total'] == 7
+    assert [item['name'] for item in resp['results']] == ['item 3', 'item 4', 'item 5']
@@ -0,0 +1,134 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+
+from fastapi_rf.responses import FastJSONResponse, MsgPackRoute, accepts_msgpack, parse_accept
+from fastapi_rf.utils import format_datetime_into_isoformat
+from .viewsets import ItemRead
+
+
+def test_fast_json_response(rf_client, create_items):
+    create_items({'name': '中文', 'price': 1}, {'name': 'b'})
+    # 与默认的 jsonable_encoder 结果一致，时间按 BaseSchemaModel 的 json_encoders 格式化
+    resp = rf_client.get('/rf/fast_json_items/')
+    assert resp.headers['content-type'] == 'application/json'
+    assert resp.json() == rf_client.get('/rf/timed_items/').json()
+    assert resp.json()[0]['name'] == '中文'
+    resp = rf_client.get('/rf/fast_json_items/1/')
+    assert resp.json() == rf_client.get('/rf/timed_items/1/').json()
+    # 返回值仍按 serializer_read 过滤字段
+    assert set(resp.json()) == {'id', 'name', 'price', 'owner', 'created_at'}
+
+
+def test_fast_json_dumps():
+    item = ItemRead(id=1, name='a', price=1, owner='')
+    content = {'at': datetime(2020, 1, 1), 'price': Decimal('1.5'), 'tags': {'a'}, 'item': item}
+    assert json.loads(FastJSONResponse.dumps(content)) == {
+        'at': format_datetime_into_isoformat(datetime(2020, 1, 1)), 'price': 1.5, 'tags': ['a'],
+        'item': {'id': 1, 'name': 'a', 'price': 1, 'owner': ''}
+    }
+
+
+msgpack = pytest.importorskip('msgpack')
+
+
+class FakeRequest:
+    def __init__(self, accept):
+        self.headers = {'accept': accept} if accept is not None else {}
+
+
+@pytest.mark.parametrize('accept, expected', [
+    (None, False),
+    ('*/*', False),
+    ('application/json', False),
+    ('application/msgpack', True),
+    ('application/x-msgpack', True),
+    ('application/json, application/msgpack;q=0', False),
+    ('application/msgpack, application/json', False),
+    ('application/json;q=0.5, application/msgpack', True),
+    ('application/*, application/msgpack;q=0.9', False),
+    ('application/msgpack;q=0.9, */*;q=0.1', True),
+    ('application/x-msgpack-extra', False),
+    ('application/msgpack;q=invalid', False),
+])
+def test_accepts_msgpack(accept, expected):
+    assert accepts_msgpack(FakeRequest(accept)) is expected
+
+
+def test_parse_accept():
+    assert parse_accept('text/html, application/json;q=0.8 ,*/*; q=0.1') == [
+        ('text/html', 1.0), ('application/json', 0.8), ('*/*', 0.1)
+    ]
+
+
+def test_msgpack_response(rf_client, create_items):
+    create_items({'name': '中文', 'price': 1})
+    resp = rf_client.get('/rf/items/', headers={'Accept': 'application/msgpack'})
+    assert resp.headers['content-type'] == 'application/msgpack'
+    assert [item['name'] for item in msgpack.unpackb(resp.content)] == ['中文']
+    assert 'Accept' in resp.headers['vary']
+    # response_class 直接渲染的视图同样支持
+    resp = rf_client.get('/rf/fast_json_items/', headers={'Accept': 'application/msgpack'})
+    assert [item['name'] for item in msgpack.unpackb(resp.content)] == ['中文']
+
+
+def test_msgpack_refused(rf_client, create_items):
+    create_items({'name': 'a'})
+    resp = rf_client.get('/rf/items/', headers={'Accept': 'application/json, application/msgpack;q=0'})
+    assert resp.headers['content-type'] == 'application/json'
+    assert resp.json()[0]['name'] == 'a'
+    assert resp.headers['vary'] == 'Accept'
+
+
+def test_msgpack_request_body(rf_client):
+    resp = rf_client.post(
+        '/rf/items/', content=msgpack.packb({'name': 'a', 'price': 3}),
+        headers={'Content-Type': 'application/msgpack'}
+    )
+    assert resp.status_code == 200
+    assert resp.json()['price'] == 3
+    resp = rf_client.post('/rf/items/', content=b'\xc1', headers={'Content-Type': 'application/msgpack'})
+    assert resp.status_code == 400
+
+
+class HeaderRoute(APIRoute):
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route_handler(request):
+            response = await handler(request)
+            response.headers['x-route'] = 'header'
+            return response
+
+        return route_handler
+
+
+def test_router_route_class(rf_client):
+    from .viewsets import ItemViewSet
+    # router 自定义的路由类与 MsgPackRoute 合并使用
+    router = APIRouter(route_class=HeaderRoute)
+    ItemViewSet.register(router, 'items')
+    app = FastAPI()
+    app.include_router(router)
+    resp = TestClient(app).post(
+        '/items/', content=msgpack.packb({'name': 'a'}), headers={'Content-Type': 'application/msgpack'}
+    )
+    assert resp.status_code == 200
+    assert resp.headers['x-route'] == 'header'
+    assert ItemViewSet.get_route_class(router) is ItemViewSet.get_route_class(APIRouter(route_class=HeaderRoute))
+    assert ItemViewSet.get_route_class(APIRouter()) is MsgPackRoute
+
+
+def test_vary_on_rendered_responses(rf_client, create_items):
+    create_items({'name': 'a'})
+    # render() 返回的响应
+    resp = rf_client.get('/rf/items/', params={'format': 'columnar'})
+    assert resp.headers['vary'] == 'Accept'
+    # endpoint 直接返回的 Response
+    resp = rf_client.get('/rf/stream_items/')
+    assert resp.headers['vary'] == 'Accept'
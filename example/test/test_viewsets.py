@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from fastapi_rf.core import GenericViewSet
+
+
+def test_projection(rf_client, create_items):
+    a, b = create_items({'name': 'a', 'price': 1}, {'name': 'b', 'price': 2})
+    assert rf_client.get('/rf/projected_items/').json() == [a, b]
+    assert rf_client.get(f"/rf/projected_items/{b['id']}/").json() == b
+    assert rf_client.get('/rf/projected_items/100/').status_code == 400
+
+
+def test_sparse_fields(rf_client, create_items):
+    a, b = create_items({'name': 'a', 'price': 1}, {'name': 'b', 'price': 2})
+    resp = rf_client.get('/rf/sparse_items/', params={'fields': 'name'})
+    assert resp.json() == [{'name': 'a'}, {'name': 'b'}]
+    resp = rf_client.get(f"/rf/sparse_items/{b['id']}/", params={'fields': 'price,id'})
+    assert resp.json() == {'price': 2, 'id': b['id']}
+    assert rf_client.get('/rf/sparse_items/', params={'fields': 'name,secret'}).status_code == 400
+
+
+def test_sparse_fields_other_actions(rf_client, create_items):
+    # 不在 sparse_fields_actions 中的接口返回全部字段
+    a, b = create_items({'name': 'a', 'price': 1}, {'name': 'b', 'price': 2})
+    resp = rf_client.get('/rf/sparse_items/bulk/', params={'ids': f"{b['id']},{a['id']}"})
+    assert resp.status_code == 200
+    assert resp.json()['results'] == [b, a]
+    resp = rf_client.get('/rf/sparse_items/export/')
+    assert resp.status_code == 200
+    assert resp.content.decode('utf-8-sig').splitlines()[0] == 'id,name,price,owner'
+
+
+def test_fast_update(rf_client, create_items):
+    a, = create_items({'name': 'a', 'price': 1})
+    bob, = create_items({'name': 'b'}, owner='bob')
+    resp = rf_client.put(f"/rf/fast_update_items/{a['id']}/", json={'name': 'aa', 'price': 10})
+    assert resp.status_code == 200
+    assert (resp.json()['name'], resp.json()['price']) == ('aa', 10)
+    resp = rf_client.patch(f"/rf/fast_update_items/{a['id']}/", json={'price': 20})
+    assert (resp.json()['name'], resp.json()['price']) == ('aa', 20)
+    # get_queryset 范围外的记录
+    resp = rf_client.patch(f"/rf/fast_update_items/{bob['id']}/", json={'price': 20}, headers={'X-Owner': 'alice'})
+    assert resp.status_code == 400
+    assert rf_client.get(f"/rf/items/{bob['id']}/").json()['price'] == 0
+
+
+def test_fast_destroy(rf_client, create_items):
+    a, = create_items({'name': 'a'}, owner='alice')
+    bob, = create_items({'name': 'b'}, owner='bob')
+    headers = {'X-Owner': 'alice'}
+    assert rf_client.delete(f"/rf/fast_destroy_items/{a['id']}/", headers=headers).status_code == 204
+    assert rf_client.delete(f"/rf/fast_destroy_items/{a['id']}/", headers=headers).status_code == 400
+    assert rf_client.delete(f"/rf/fast_destroy_items/{bob['id']}/", headers=headers).status_code == 400
+    assert [item['name'] for item in rf_client.get('/rf/items/').json()] == ['b']
+
+
+def test_eager_loading(rf_client, create_items, monkeypatch):
+    # raise_on_lazy_load 下未预加载的关系被访问时报错
+    monkeypatch.setattr(GenericViewSet, '_serializer_loader_options', {})
+    category = rf_client.post('/rf/categories/', json={'name': 'c'}).json()
+    a, b = create_items({'name': 'a', 'category_id': category['id']}, {'name': 'b'})
+    # 两个视图共用 (model, serializer_read) 的缓存，先请求声明了 select_related 的视图
+    for path in ('joined_category_items', 'category_items'):
+        resp = rf_client.get(f'/rf/{path}/')
+        assert resp.status_code == 200
+        assert [item['category'] for item in resp.json()] == [category, None]
+        resp = rf_client.get(f"/rf/{path}/{a['id']}/")
+        assert resp.json()['category'] == category
+
+
+def test_eager_loading_self_referential(rf_client):
+    # 自引用的 serializer 只展开一层，不会无限递归
+    root = rf_client.post('/rf/categories/', json={'name': 'root'}).json()
+    child = rf_client.post('/rf/categories/', json={'name': 'child', 'parent_id': root['id']}).json()
+    resp = rf_client.get('/rf/category_tree/')
+    assert resp.status_code == 200
+    assert resp.json() == [
+        {**root, 'parent': None},
+        {**child, 'parent': {**root, 'parent': None}},
+    ]
+
+
+def test_conditional_list(rf_client, create_items):
+    a, b = create_items({'name': 'a'}, {'name': 'b'})
+    resp = rf_client.get('/rf/conditional_items/')
+    etag = resp.headers['etag']
+    assert 'last-modified' not in resp.headers
+    resp = rf_client.get('/rf/conditional_items/', headers={'If-None-Match': etag})
+    assert resp.status_code == 304
+    assert resp.headers['vary'] == 'Accept'
+    # 不同的查询参数或返回格式 ETag 不同
+    assert rf_client.get('/rf/conditional_items/', params={'format': 'columnar'}).headers['etag'] != etag
+    # 删除较早的记录不改变 max(updated_at)，仍需返回新的数据
+    assert rf_client.delete(f"/rf/conditional_items/{a['id']}/").status_code == 204
+    resp = rf_client.get('/rf/conditional_items/', headers={'If-None-Match': etag})
+    assert resp.status_code == 200
+    assert [item['name'] for item in resp.json()] == ['b']
+    # list 不使用 If-Modified-Since
+    since = format_datetime(datetime.now(timezone.utc) + timedelta(days=1), usegmt=True)
+    assert rf_client.get('/rf/conditional_items/', headers={'If-Modified-Since': since}).status_code == 200
+
+
+def test_conditional_retrieve(rf_client, create_items):
+    a, = create_items({'name': 'a'})
+    resp = rf_client.get(f"/rf/conditional_items/{a['id']}/")
+    etag, last_modified = resp.headers['etag'], resp.headers['last-modified']
+    assert rf_client.get(f"/rf/conditional_items/{a['id']}/", headers={'If-None-Match': etag}).status_code == 304
+    resp = rf_client.get(f"/rf/conditional_items/{a['id']}/", headers={'If-Modified-Since': last_modified})
+    assert resp.status_code == 304
+    rf_client.patch(f"/rf/items/{a['id']}/", json={'price': 1})
+    resp = rf_client.get(f"/rf/conditional_items/{a['id']}/", headers={'If-None-Match': etag})
+    assert resp.status_code == 200
+    assert resp.json()['price'] == 1
+
+
+def test_object_cache(rf_client, create_items):
+    from .viewsets import object_cache
+    a, = create_items({'name': 'a', 'price': 1})
+    assert rf_client.get(f"/rf/cached_items/{a['id']}/").json()['price'] == 1
+    assert len(object_cache._data) == 1
+    # 绕过缓存修改的数据在缓存过期前不可见
+    rf_client.patch(f"/rf/items/{a['id']}/", json={'price': 2})
+    assert rf_client.get(f"/rf/cached_items/{a['id']}/").json()['price'] == 1
+    # 通过缓存视图修改时删除缓存
+    rf_client.put(f"/rf/cached_items/{a['id']}/", json={'name': 'a', 'price': 3})
+    assert rf_client.get(f"/rf/cached_items/{a['id']}/").json()['price'] == 3
+    assert rf_client.delete(f"/rf/cached_items/{a['id']}/").status_code == 204
+    assert rf_client.get(f"/rf/cached_items/{a['id']}/").status_code == 400
+
+
+def test_object_cache_invalidated_after_commit(rf_client, create_items, monkeypatch):
+    from .viewsets import object_cache
+    a, = create_items({'name': 'a', 'price': 1})
+    rf_client.get(f"/rf/cached_items/{a['id']}/")
+    stale = dict(object_cache._data)
+    delete = object_cache.delete
+    calls = []
+
+    async def delete_then_recache(*keys):
+        # 模拟提交前的并发读取：删除缓存后又把旧数据写回缓存
+        await delete(*keys)
+        calls.append(keys)
+        if len(calls) == 1:
+            object_cache._data.update(stale)
+
+    monkeypatch.setattr(object_cache, 'delete', delete_then_recache)
+    rf_client.put(f"/rf/cached_items/{a['id']}/", json={'name': 'a', 'price': 2})
+    assert len(calls) == 2
+    assert rf_client.get(f"/rf/cached_items/{a['id']}/").json()['price'] == 2
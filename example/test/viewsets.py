@@ -0,0 +1,312 @@
+"""
+fastapi_rf 各 mixin 与选项的测试用视图，使用单独的 Base 建表，不依赖 main 中的业务模块
+"""
+from datetime import datetime
+
+from fastapi import APIRouter, FastAPI
+from pydantic import BaseModel
+from sqlalchemy import Column, ForeignKey, Integer, String
+from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.sql.expression import Select
+
+from config.database import DATABASE
+from fastapi_rf.cache import LRUObjectCache
+from fastapi_rf.conditional import ConditionalGetMixin
+from fastapi_rf.core import GenericViewSet, register
+from fastapi_rf.fields import SparseFieldsMixin
+from fastapi_rf.mixin import (
+    BatchCreateMixin, BatchDestroyMixin, BatchUpdateMixin, BulkRetrieveMixin, CreateMixin, DestroyMixin,
+    ExportMixin, IngestMixin, ListMixin, PartialUpdateMixin, RetrieveMixin, UpdateMixin, UpsertMixin
+)
+from fastapi_rf.models import CoreModel
+from fastapi_rf.pagination import BasePagination, CursorPagination, LimitOffsetPagination, PageSizePagination
+from fastapi_rf.responses import FastJSONResponse
+from fastapi_rf.serializers import BaseSchemaModel
+
+RFBase = declarative_base()
+
+
+class RFCategory(CoreModel, RFBase):
+    name = Column(String(64))
+    parent_id = Column(Integer, ForeignKey('rfcategory.id'), nullable=True)
+    parent = relationship('RFCategory', remote_side='RFCategory.id')
+
+
+class RFItem(CoreModel, RFBase):
+    name = Column(String(64), unique=True)
+    price = Column(Integer, default=0)
+    owner = Column(String(64), default='')
+    category_id = Column(Integer, ForeignKey('rfcategory.id'), nullable=True)
+    category = relationship(RFCategory)
+
+
+class ItemRead(BaseSchemaModel):
+    id: int
+    name: str
+    price: int
+    owner: str
+
+
+class ItemWrite(BaseModel):
+    name: str
+    price: int = 0
+    owner: str = ''
+    category_id: int | None = None
+
+
+class TimedItemRead(ItemRead):
+    created_at: datetime
+
+
+class CategoryRead(BaseSchemaModel):
+    id: int
+    name: str
+
+
+class CategoryWrite(BaseModel):
+    name: str
+    parent_id: int | None = None
+
+
+class ItemWithCategoryRead(ItemRead):
+    category: CategoryRead | None
+
+
+class CategoryTreeRead(BaseSchemaModel):
+    id: int
+    name: str
+    parent: 'CategoryTreeRead | None'
+
+
+CategoryTreeRead.update_forward_refs()
+
+
+class OwnerScopeMixin:
+    """
+    请求头 X-Owner 模拟数据范围，设置后只能访问该 owner 的记录，创建的记录属于该 owner
+    """
+    model = RFItem
+    serializer_read = ItemRead
+    serializer_write = ItemWrite
+
+    async def get_queryset(self) -> Select:
+        qs = await super().get_queryset()
+        owner = self.request.headers.get('x-owner') if self.request is not None else None
+        if owner:
+            qs = qs.where(RFItem.owner == owner)
+        return qs
+
+    async def get_create_extra_info(self) -> dict:
+        owner = self.request.headers.get('x-owner')
+        return {'owner': owner} if owner else {}
+
+
+router = APIRouter(prefix='/rf')
+
+
+@register(router, 'items')
+class ItemViewSet(
+    OwnerScopeMixin,
+    ListMixin,
+    CreateMixin,
+    RetrieveMixin,
+    UpdateMixin,
+    PartialUpdateMixin,
+    DestroyMixin,
+    BatchCreateMixin,
+    GenericViewSet
+):
+    pass
+
+
+@register(router, 'cursor_items')
+class CursorItemViewSet(ListMixin, GenericViewSet):
+    model = RFItem
+    serializer_read = ItemRead
+    pagination_class = CursorPagination
+    order_by = '-price'
+
+
+@register(router, 'paged_items')
+class PagedItemViewSet(ListMixin, GenericViewSet):
+    model = RFItem
+    serializer_read = ItemRead
+    pagination_class = LimitOffsetPagination
+
+
+@register(router, 'uncounted_items')
+class UncountedItemViewSet(PagedItemViewSet):
+    pagination_count = 'none'
+
+
+@register(router, 'cached_count_items')
+class CachedCountItemViewSet(PagedItemViewSet):
+    pagination_count = 'cached'
+
+
+@register(router, 'estimated_items')
+class EstimatedItemViewSet(PagedItemViewSet):
+    pagination_count = 'estimate'
+    pagination_count_threshold = 100
+
+
+@register(router, 'page_size_items')
+class PageSizeItemViewSet(PagedItemViewSet):
+    pagination_class = PageSizePagination
+    pagination_count = 'none'
+
+
+@register(router, 'window_items')
+class WindowItemViewSet(PagedItemViewSet):
+    pagination_count = 'window'
+
+
+@register(router, 'page_size_window_items')
+class PageSizeWindowItemViewSet(PagedItemViewSet):
+    pagination_class = PageSizePagination
+    pagination_count = 'window'
+
+
+@register(router, 'deferred_items')
+class DeferredItemViewSet(PagedItemViewSet):
+    pagination_deferred_join = True
+
+
+@register(router, 'projected_items')
+class ProjectedItemViewSet(ListMixin, RetrieveMixin, GenericViewSet):
+    model = RFItem
+    serializer_read = ItemRead
+    projection = True
+
+
+@register(router, 'sparse_items')
+class SparseItemViewSet(
+    SparseFieldsMixin, ListMixin, RetrieveMixin, BulkRetrieveMixin, ExportMixin, GenericViewSet
+):
+    model = RFItem
+    serializer_read = ItemRead
+    projection = True
+
+
+@register(router, 'timed_items')
+class TimedItemViewSet(ListMixin, RetrieveMixin, GenericViewSet):
+    model = RFItem
+    serializer_read = TimedItemRead
+
+
+@register(router, 'fast_json_items')
+class FastJSONItemViewSet(TimedItemViewSet):
+    response_class = FastJSONResponse
+
+
+@register(router, 'stream_items')
+class StreamItemViewSet(ListMixin, GenericViewSet):
+    model = RFItem
+    serializer_read = ItemRead
+    list_stream = True
+    stream_chunk_size = 2
+
+
+@register(router, 'categories')
+class CategoryViewSet(CreateMixin, GenericViewSet):
+    model = RFCategory
+    serializer_read = CategoryRead
+    serializer_write = CategoryWrite
+
+
+@register(router, 'export_items')
+class ExportItemViewSet(OwnerScopeMixin, ExportMixin, GenericViewSet):
+    pass
+
+
+@register(router, 'category_export_items')
+class CategoryExportItemViewSet(ExportMixin, GenericViewSet):
+    model = RFItem
+    serializer_read = ItemWithCategoryRead
+    select_related = ('category',)
+
+
+@register(router, 'ingest_items')
+class IngestItemViewSet(OwnerScopeMixin, IngestMixin, GenericViewSet):
+    ingest_chunk_size = 2
+
+
+@register(router, 'batch_update_items')
+class BatchUpdateItemViewSet(OwnerScopeMixin, BatchUpdateMixin, GenericViewSet):
+    pass
+
+
+@register(router, 'fast_update_items')
+class FastUpdateItemViewSet(OwnerScopeMixin, UpdateMixin, PartialUpdateMixin, GenericViewSet):
+    fast_update = True
+
+
+@register(router, 'fast_destroy_items')
+class FastDestroyItemViewSet(OwnerScopeMixin, DestroyMixin, GenericViewSet):
+    fast_destroy = True
+
+
+@register(router, 'batch_destroy_items')
+class BatchDestroyItemViewSet(OwnerScopeMixin, BatchDestroyMixin, GenericViewSet):
+    batch_destroy_chunk_size = 2
+
+
+@register(router, 'upsert_items')
+class UpsertItemViewSet(OwnerScopeMixin, UpsertMixin, GenericViewSet):
+    upsert_conflict_fields = ('name',)
+
+
+@register(router, 'bulk_items')
+class BulkRetrieveItemViewSet(OwnerScopeMixin, BulkRetrieveMixin, GenericViewSet):
+    pass
+
+
+@register(router, 'category_items')
+class CategoryItemViewSet(ListMixin, RetrieveMixin, GenericViewSet):
+    model = RFItem
+    serializer_read = ItemWithCategoryRead
+    eager_load_serializer = True
+    raise_on_lazy_load = True
+
+
+@register(router, 'joined_category_items')
+class JoinedCategoryItemViewSet(CategoryItemViewSet):
+    # 与 CategoryItemViewSet 使用相同的 (model, serializer_read)，声明的关系不同
+    select_related = ('category',)
+
+
+@register(router, 'category_tree')
+class CategoryTreeViewSet(ListMixin, GenericViewSet):
+    model = RFCategory
+    serializer_read = CategoryTreeRead
+    eager_load_serializer = True
+
+
+@register(router, 'conditional_items')
+class ConditionalItemViewSet(ConditionalGetMixin, ListMixin, RetrieveMixin, DestroyMixin, GenericViewSet):
+    model = RFItem
+    serializer_read = ItemRead
+
+
+object_cache = LRUObjectCache(ttl=60)
+
+
+@register(router, 'cached_items')
+class CachedItemViewSet(RetrieveMixin, UpdateMixin, DestroyMixin, GenericViewSet):
+    model = RFItem
+    serializer_read = ItemRead
+    serializer_write = ItemWrite
+    object_cache = object_cache
+
+
+app = FastAPI()
+app.include_router(router)
+
+
+@app.on_event('startup')
+async def init_database():
+    async with DATABASE.engine.begin() as conn:
+        await conn.run_sync(RFBase.metadata.drop_all)
+        await conn.run_sync(RFBase.metadata.create_all)
+    BasePagination._count_cache.clear()
+    object_cache.clear()
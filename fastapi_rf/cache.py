@@ -0,0 +1,143 @@
+import base64
+import json
+import time
+from collections import OrderedDict
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+from uuid import UUID
+
+try:
+    from redis.asyncio import Redis
+except ImportError:  # pragma: no cover
+    Redis = None
+
+
+class ObjectCache:
+    """
+    对象缓存，缓存对象的列值
+
+    同一个对象在不同数据范围（get_queryset）下分别缓存，scope 区分数据范围；
+    按 key 删除时删除该对象在所有数据范围下的缓存
+    """
+
+    async def get(self, key: str, scope: str) -> dict | None:
+        raise NotImplementedError
+
+    async def set(self, key: str, scope: str, value: dict):
+        raise NotImplementedError
+
+    async def delete(self, *keys: str):
+        raise NotImplementedError
+
+
+class LRUObjectCache(ObjectCache):
+    """
+    进程内 LRU 缓存，超过 max_size 时淘汰最久未使用的对象，缓存 ttl 秒后过期；
+    多进程部署时其他进程的缓存不会被删除，最多在 ttl 秒内返回旧数据
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        # key: (过期时间, {scope: 列值})
+        self._data: OrderedDict[str, tuple[float, dict[str, dict]]] = OrderedDict()
+
+    async def get(self, key: str, scope: str) -> dict | None:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        self._data.move_to_end(key)
+        return entry[1].get(scope)
+
+    async def set(self, key: str, scope: str, value: dict):
+        now = time.monotonic()
+        entry = self._data.get(key)
+        if entry is None or entry[0] < now:
+            entry = self._data[key] = (now + self.ttl, {})
+        entry[1][scope] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+
+# json 不支持的列值类型：(类型名, 类型, 编码, 解码)，datetime 是 date 的子类，需要在 date 之前
+_VALUE_TYPES = [
+    ('datetime', datetime, datetime.isoformat, datetime.fromisoformat),
+    ('date', date, date.isoformat, date.fromisoformat),
+    ('time', dt_time, dt_time.isoformat, dt_time.fromisoformat),
+    ('timedelta', timedelta, timedelta.total_seconds, lambda value: timedelta(seconds=value)),
+    ('decimal', Decimal, str, Decimal),
+    ('uuid', UUID, str, UUID),
+    ('bytes', bytes, lambda value: base64.b64encode(value).decode(), base64.b64decode),
+]
+_DECODERS = {name: decode for name, _, _, decode in _VALUE_TYPES}
+
+
+def dumps_values(value: dict) -> bytes:
+    """
+    列值编码为 json，json 不支持的类型转为字符串等并在 types 中记录类型名；
+    不支持的类型（如 Enum）抛出 TypeError
+    """
+    values, types = {}, {}
+    for name, item in value.items():
+        for type_name, type_, encode, _ in _VALUE_TYPES:
+            if isinstance(item, type_):
+                values[name], types[name] = encode(item), type_name
+                break
+        else:
+            values[name] = item
+    return json.dumps({'values': values, 'types': types}, ensure_ascii=False).encode()
+
+
+def loads_values(data: bytes) -> dict:
+    data = json.loads(data)
+    values = data['values']
+    for name, type_name in data['types'].items():
+        values[name] = _DECODERS[type_name](values[name])
+    return values
+
+
+class RedisObjectCache(ObjectCache):
+    """
+    redis 缓存，多进程共享；每个对象一个 hash，field 为 scope，删除对象时删除整个 hash；
+    列值按 json 存储，不使用 pickle，能写入 redis 的人无法借此执行代码；包含不支持类型的对象不缓存
+    """
+
+    def __init__(self, client: 'Redis | str', ttl: float = 60, prefix: str = 'fastapi_rf:object:') -> None:
+        if Redis is None:
+            raise RuntimeError('redis is required for RedisObjectCache')
+        self.client = Redis.from_url(client) if isinstance(client, str) else client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key: str, scope: str) -> dict | None:
+        value = await self.client.hget(self.prefix + key, scope)
+        if value is None:
+            return None
+        return loads_values(value)
+
+    async def set(self, key: str, scope: str, value: dict):
+        try:
+            data = dumps_values(value)
+        except TypeError:
+            return
+        name = self.prefix + key
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.hset(name, scope, data)
+            # 按毫秒设置过期时间，ttl 小于 1 秒时不会立即过期
+            pipe.pexpire(name, max(1, int(self.ttl * 1000)))
+            await pipe.execute()
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
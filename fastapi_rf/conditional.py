@@ -0,0 +1,92 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Response
+from sqlalchemy import func, select
+from sqlalchemy.sql.expression import Select
+
+from fastapi_rf.core import GenericViewSet
+
+
+class ConditionalGetMixin(GenericViewSet, ignores=['conditional_field']):
+    """
+    list/retrieve 支持条件请求
+
+    retrieve 的 ETag/Last-Modified 由对象的 updated_at 生成；list 只返回 ETag，由查询结果的 max(updated_at) 与 count 生成，
+    删除数据时 max(updated_at) 可能不变，因此 list 不使用 Last-Modified/If-Modified-Since；
+    请求头 If-None-Match/If-Modified-Since 匹配时只执行一次探测查询，直接返回 304，不查询数据也不序列化
+    """
+    # 记录修改时间的字段，模型没有该字段时不处理条件请求
+    conditional_field: str = 'updated_at'
+
+    async def check_not_modified(self, qs: Select, detail: bool = False) -> Response | None:
+        column = getattr(self.model, self.conditional_field, None)
+        if column is None:
+            return None
+        qs = qs.order_by(None)
+        if detail:
+            last_modified = await self.db.scalar(
+                qs.with_only_columns(column).filter_by(**{self.pk_field: getattr(self, self.pk_field)})
+            )
+            if last_modified is None:
+                # 不存在或没有修改时间，交给 retrieve 处理
+                return None
+            version = f'{getattr(self, self.pk_field)}:{last_modified.isoformat()}'
+        else:
+            subquery = qs.with_only_columns(column).subquery()
+            last_modified, count = (await self.db.execute(
+                select(func.max(subquery.c[0]), func.count()).select_from(subquery)
+            )).one()
+            # 查询语句与参数区分不同的过滤条件与数据范围
+            compiled = qs.compile()
+            version = f'{compiled}:{sorted(compiled.params.items(), key=str)}:{last_modified}:{count}'
+            # 不返回 Last-Modified，只按 ETag 判断
+            last_modified = None
+        etag = self.make_etag(version)
+        headers = {'ETag': etag}
+        if last_modified is not None:
+            headers['Last-Modified'] = self.format_http_date(last_modified)
+        if self.is_not_modified(etag, last_modified):
+            return Response(status_code=304, headers=headers)
+        if self.response is not None:
+            self.response.headers.update(headers)
+        return None
+
+    def make_etag(self, version: str) -> str:
+        # 查询参数（翻页、返回字段、格式等）与返回格式不同时返回内容不同
+        request = self.request
+        if request is not None:
+            version = f'{version}:{request.url.query}:{request.headers.get("accept", "")}'
+        return f'W/"{hashlib.sha1(version.encode()).hexdigest()}"'
+
+    def is_not_modified(self, etag: str, last_modified: datetime | None) -> bool:
+        request = self.request
+        if request is None:
+            return False
+        if_none_match = request.headers.get('if-none-match')
+        if if_none_match is not None:
+            # 有 If-None-Match 时忽略 If-Modified-Since，弱比较
+            tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+            return '*' in tags or etag.removeprefix('W/') in tags
+        if_modified_since = request.headers.get('if-modified-since')
+        if if_modified_since is None or last_modified is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP 日期只精确到秒
+        return self.to_utc(last_modified).replace(microsecond=0) <= since
+
+    @staticmethod
+    def to_utc(value: datetime) -> datetime:
+        # updated_at 使用 utcnow 写入，没有时区时按 UTC 处理
+        if value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc)
+
+    def format_http_date(self, value: datetime) -> str:
+        return format_datetime(self.to_utc(value), usegmt=True)
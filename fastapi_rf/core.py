@@ -1,16 +1,28 @@
 import asyncio
+import hashlib
 import inspect
 import typing as t
-from functools import wraps
+from datetime import datetime
+from functools import partial, wraps
 from typing import Any, Callable
 
 import fastapi.params
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy import text
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from sqlalchemy import delete, inspect as sa_inspect, insert, text, update
+from sqlalchemy.engine import RowMapping
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import ColumnProperty, joinedload, make_transient_to_detached, raiseload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.sql.expression import select, Select
 
-from fastapi_rf.dependency import get_db
+from fastapi_rf.cache import ObjectCache
+from fastapi_rf.database import add_after_commit
+from fastapi_rf.dependency import SAFE_METHODS, get_db
+from fastapi_rf.responses import (
+    FastJSONResponse, MsgPackResponse, MsgPackRoute, accepts_msgpack, render_endpoint, vary_accept
+)
 from fastapi_rf.serializers import AllOptional
 
 
@@ -139,11 +151,22 @@ def add_dependency_to_self(name, func, default=inspect.Parameter.empty, annotati
     return new_func
 
 
-class BaseViewSet(t.Generic[T, R, W], metaclass=ViewSetMetaClass, ignores=['pk_field', 'pk_type']):
+class BaseViewSet(t.Generic[T, R, W], metaclass=ViewSetMetaClass, ignores=[
+    'pk_field', 'pk_type', 'response_class', 'route_class'
+]):
     if t.TYPE_CHECKING:
         _dependencies: dict = {}
     pk_field = 'id'
     pk_type = int
+    request: Request = None
+    # 依赖中的响应，用于设置响应头
+    response: Response = None
+    # 设置后 endpoint 的返回值由 response_class 直接渲染，不经过 fastapi 的 jsonable_encoder，如 FastJSONResponse
+    response_class: t.Type[Response] | None = None
+    # 默认支持 msgpack 请求体，与 router 的 route_class 合并使用
+    route_class: t.Type[APIRoute] = MsgPackRoute
+    # 按 (route_class, router.route_class) 缓存的合并后的路由类
+    _route_classes = {}
 
     @classmethod
     def discover_endpoint(cls):
@@ -173,14 +196,48 @@ class BaseViewSet(t.Generic[T, R, W], metaclass=ViewSetMetaClass, ignores=['pk_f
                 cls.pk_field, func, annotation=cls.pk_type, )
         return func
 
+    def render(self, content, **kwargs) -> Response:
+        """
+        直接渲染返回值，用于返回结构与返回类型注解不同的情况，请求头 Accept 中 msgpack 优先时返回 msgpack
+        """
+        if accepts_msgpack(self.request):
+            return vary_accept(MsgPackResponse(content, **kwargs))
+        return vary_accept((self.response_class or FastJSONResponse)(content, **kwargs))
+
+    @classmethod
+    def get_route_class(cls, router: APIRouter) -> t.Type[APIRoute]:
+        """
+        合并 viewset 与 router 的 route_class，router 上自定义的路由类不会被覆盖
+        """
+        route_class, router_class = cls.route_class, router.route_class
+        if issubclass(router_class, route_class):
+            return router_class
+        if issubclass(route_class, router_class):
+            return route_class
+        key = (route_class, router_class)
+        combined = BaseViewSet._route_classes.get(key)
+        if combined is None:
+            combined = BaseViewSet._route_classes[key] = type(
+                f'{route_class.__name__}{router_class.__name__}', (route_class, router_class), {}
+            )
+        return combined
+
     @classmethod
     def register(cls, router: APIRouter, path):
+        route_kwargs = {}
+        if cls.response_class is not None:
+            route_kwargs['response_class'] = cls.response_class
+        route_class = cls.get_route_class(router)
         for _, func in cls.discover_endpoint():
+            func = render_endpoint(func, cls.response_class)
             if func.detail:
-                getattr(router, func.method)(
-                    f"/{path}/{{{cls.pk_field}}}{func.url}")(func)
+                url = f"/{path}/{{{cls.pk_field}}}{func.url}"
             else:
-                getattr(router, func.method)(f"/{path}{func.url}")(func)
+                url = f"/{path}{func.url}"
+            router.add_api_route(
+                url, func, methods=[func.method.upper()], route_class_override=route_class,
+                **{**route_kwargs, **func.kwargs}
+            )
 
 
 class register:
@@ -193,31 +250,381 @@ class register:
         return cls
 
 
-class GenericViewSet(BaseViewSet, ignores=['serializer_read', 'serializer_write', 'model']):
+def get_value(row, key):
+    """
+    从 ORM 对象或投影查询的行中取值
+    """
+    if isinstance(row, RowMapping):
+        return row[key]
+    return getattr(row, key)
+
+
+class GenericViewSet(BaseViewSet, ignores=[
+    'serializer_read', 'serializer_write', 'model', 'projection', 'bulk_insert_chunk_size', 'fast_update',
+    'fast_destroy', 'select_related', 'prefetch_related', 'eager_load_serializer', 'raise_on_lazy_load',
+    'object_cache'
+]):
     model: T
     db: AsyncSession = Depends(get_db)
     serializer_read: R
     serializer_write: W
     order_by: int = 'id'
+    # 列投影，list/retrieve 只查询 serializer_read 中声明的列，直接由查询结果的行生成返回值
+    projection: bool = False
+    # 批量插入时每条 INSERT 语句包含的行数
+    bulk_insert_chunk_size: int = 1000
+    # update/partial_update 使用一条 UPDATE ... RETURNING 完成，不先查询对象；不会触发 mapper 事件
+    fast_update: bool = False
+    # destroy 使用一条 DELETE 完成，不先查询对象；不会触发 mapper 事件和 ORM 级联删除
+    fast_destroy: bool = False
+    # 查询时预加载的关系，支持 a.b 形式的多级关系；select_related 使用 joinedload，适合多对一，
+    # prefetch_related 使用 selectinload，适合一对多/多对多
+    select_related: tuple[str, ...] = ()
+    prefetch_related: tuple[str, ...] = ()
+    # 根据 serializer_read 中与关系同名的字段自动预加载，需显式开启
+    eager_load_serializer: bool = False
+    # 开发环境使用，未预加载的关系被访问时直接报错
+    raise_on_lazy_load: bool = False
+    # 对象缓存，GET 等安全方法的 get_object 先查缓存，如 LRUObjectCache(ttl=60)；更新、删除后自动删除缓存
+    object_cache: ObjectCache | None = None
+    # 按 serializer_write 缓存的部分更新 serializer，多个 viewset 共用时保证是同一个类
+    _partial_serializers = {}
+    # 按 (model, serializer_read) 缓存的自动预加载选项 [(关系路径, 加载选项)]
+    _serializer_loader_options = {}
     if t.TYPE_CHECKING:
         id: t.Any
 
     async def get_queryset(self) -> Select:
+        # 字段名使用带表名的列排序，关联查询（如 joinedload）时不会有歧义
+        column = getattr(self.model, self.order_by, None) if isinstance(self.order_by, str) else None
+        if isinstance(getattr(column, 'property', None), ColumnProperty):
+            return select(self.model).order_by(column)
         return select(self.model).order_by(text(self.order_by))
 
+    @classmethod
+    def get_partial_serializer(cls) -> t.Type[BaseModel]:
+        """
+        所有字段都可选的 serializer_write，用于部分更新
+        """
+        serializer = cls.serializer_write
+        partial = GenericViewSet._partial_serializers.get(serializer)
+        if partial is None:
+            partial = GenericViewSet._partial_serializers[serializer] = AllOptional(
+                f'Optional{serializer.__name__}', (serializer,), {}
+            )
+        return partial
+
+    async def check_not_modified(self, qs: Select, detail: bool = False) -> Response | None:
+        """
+        条件请求，资源未修改时返回 304 响应，见 fastapi_rf.conditional.ConditionalGetMixin
+        """
+        return None
+
+    def get_loader_options(self) -> list:
+        """
+        list/retrieve 查询时使用的关系加载选项，在执行查询时添加，不影响 get_queryset 的结果
+        """
+        options = [self.build_loader_option(joinedload, path) for path in self.select_related]
+        options += [self.build_loader_option(selectinload, path) for path in self.prefetch_related]
+        if self.eager_load_serializer:
+            options += self.get_serializer_loader_options()
+        if self.raise_on_lazy_load:
+            options.append(raiseload('*'))
+        return options
+
+    def with_loader_options(self, qs: Select) -> Select:
+        options = self.get_loader_options()
+        return qs.options(*options) if options else qs
+
+    def build_loader_option(self, loader, path: str):
+        model = self.model
+        option = None
+        for name in path.split('.'):
+            attr = getattr(model, name)
+            option = loader(attr) if option is None else getattr(option, loader.__name__)(attr)
+            model = attr.property.mapper.class_
+        return option
+
+    def get_serializer_loader_options(self) -> list:
+        """
+        serializer_read 中与关系同名的字段：多对一使用 joinedload，集合使用 selectinload，
+        字段类型是 serializer 时继续处理其中的关系；已在 select_related/prefetch_related 中声明的关系跳过。
+        自引用等循环的 (model, serializer) 只展开一次，更深的层级需要在 select_related/prefetch_related 中声明
+        """
+        key = (self.model, self.serializer_read)
+        paths = GenericViewSet._serializer_loader_options.get(key)
+        if paths is None:
+            paths = GenericViewSet._serializer_loader_options[key] = []
+
+            def walk(serializer, model, option, prefix, ancestors):
+                ancestors = ancestors | {(model, serializer)}
+                relationships = sa_inspect(model).relationships
+                for name, field in serializer.__fields__.items():
+                    relationship = relationships.get(name)
+                    if relationship is None:
+                        continue
+                    path = f'{prefix}{name}'
+                    loader = selectinload if relationship.uselist else joinedload
+                    attr = getattr(model, name)
+                    child = loader(attr) if option is None else getattr(option, loader.__name__)(attr)
+                    paths.append((path, child))
+                    if not inspect.isclass(field.type_) or not issubclass(field.type_, BaseModel):
+                        continue
+                    if (relationship.mapper.class_, field.type_) not in ancestors:
+                        walk(field.type_, relationship.mapper.class_, child, f'{path}.', ancestors)
+
+            walk(self.serializer_read, self.model, None, '', frozenset())
+        # 缓存不区分 viewset，各 viewset 声明的关系在每次调用时过滤
+        declared = {*self.select_related, *self.prefetch_related}
+        return [option for path, option in paths if path not in declared]
+
+    def get_projection_fields(self) -> list[str]:
+        return list(self.serializer_read.__fields__)
+
+    def get_projection_columns(self) -> dict | None:
+        """
+        返回投影字段对应的列 {字段名: 列}，主键总是包含在内；
+        投影字段中有非列字段（如关系）时无法投影，返回 None
+        """
+        columns = {}
+        for name in [self.pk_field, *self.get_projection_fields()]:
+            attr = getattr(self.model, name, None)
+            if not isinstance(getattr(attr, 'property', None), ColumnProperty):
+                return None
+            columns[name] = attr.label(name)
+        return columns
+
+    def use_projection(self) -> bool:
+        return bool(self.projection) and self.get_projection_columns() is not None
+
+    def project(self, qs: Select, *extra_columns) -> Select:
+        """
+        将查询改为只查询投影列，保留原查询的条件、关联与排序
+        """
+        columns = self.get_projection_columns()
+        for column in extra_columns:
+            columns.setdefault(column.key, column.label(column.key))
+        return qs.with_only_columns(*columns.values(), maintain_column_froms=True)
+
+    async def get_results(self, qs: Select) -> list:
+        """
+        执行查询，投影模式返回行（RowMapping），否则返回 ORM 对象
+        """
+        if self.use_projection():
+            return (await self.db.execute(self.project(qs))).mappings().all()
+        return (await self.db.scalars(self.with_loader_options(qs))).all()
+
+    async def iter_results(self, qs: Select, chunk_size: int = 1000) -> t.AsyncIterator[list]:
+        """
+        使用服务端游标分批执行查询，每次返回 chunk_size 行
+        """
+        qs = qs.execution_options(yield_per=chunk_size)
+        if self.use_projection():
+            result = (await self.db.stream(self.project(qs))).mappings()
+        else:
+            result = await self.db.stream_scalars(self.with_loader_options(qs))
+        async for partition in result.partitions(chunk_size):
+            yield partition
+
+    def can_bulk_insert(self, rows: list[dict]) -> bool:
+        """
+        数据库支持 INSERT ... RETURNING、模型没有 before_insert/after_insert 事件，
+        且 rows 中的键都是列（不是关系或 property setter）时可以使用批量插入，批量插入不会触发 mapper 事件
+        """
+        mapper = sa_inspect(self.model)
+        if mapper.dispatch.before_insert or mapper.dispatch.after_insert:
+            return False
+        columns = mapper.column_attrs.keys()
+        if any(key not in columns for row in rows for key in row):
+            return False
+        dialect = self.db.get_bind().dialect
+        return dialect.insert_returning and dialect.insert_executemany_returning
+
+    async def bulk_insert(self, rows: list[dict], chunk_size: int | None = None) -> list[T]:
+        """
+        批量插入，按 chunk_size 分批，每批一条多行 INSERT ... RETURNING，按 rows 的顺序返回 ORM 对象；
+        不支持批量插入时退化为 add_all 后每批 flush 一次
+        """
+        chunk_size = chunk_size or self.bulk_insert_chunk_size
+        bulk = self.can_bulk_insert(rows)
+        # sqlite 上 sort_by_parameter_order 会退化为逐行 INSERT，而单条 INSERT 中的自增主键按行顺序分配，
+        # 改为按自增主键排序返回结果；rows 中指定了主键时主键顺序与行顺序无关，不能排序
+        sort_key = None
+        if bulk and self.db.get_bind().dialect.name == 'sqlite':
+            autoincrement_column = self.model.__table__.autoincrement_column
+            if autoincrement_column is not None:
+                key = sa_inspect(self.model).get_property_by_column(autoincrement_column).key
+                if all(row.get(key) is None for row in rows):
+                    sort_key = key
+        instances = []
+        for i in range(0, len(rows), chunk_size):
+            chunk = rows[i:i + chunk_size]
+            if bulk:
+                stmt = insert(self.model).returning(self.model, sort_by_parameter_order=sort_key is None)
+                chunk_instances = (await self.db.scalars(stmt, chunk)).all()
+                if sort_key is not None:
+                    chunk_instances.sort(key=lambda instance: getattr(instance, sort_key))
+                instances.extend(chunk_instances)
+            else:
+                chunk_instances = [self.model(**row) for row in chunk]
+                self.db.add_all(chunk_instances)
+                await self.db.flush()
+                instances.extend(chunk_instances)
+        return instances
+
     async def get_object(self, *options) -> T:
+        qs = await self.get_queryset()
+        loader_options = [*self.get_loader_options(), *options]
+        # 只缓存列，有关系加载选项时不使用缓存；写请求总是查询数据库
+        use_cache = (
+                self.object_cache is not None and not loader_options
+                and self.request is not None and self.request.method in SAFE_METHODS
+        )
+        if use_cache:
+            key = self.get_cache_key(getattr(self, self.pk_field))
+            scope = self.get_cache_scope(qs)
+            values = await self.object_cache.get(key, scope)
+            if values is not None:
+                return self.build_cached_object(values)
         ret = await self.db.scalar(
-            (await self.get_queryset()).filter_by(**{
+            qs.filter_by(**{
                 self.pk_field: getattr(self, self.pk_field)
-            }).options(*options)
+            }).options(*loader_options)
         )
         if ret is None:
             raise HTTPException(
                 400,
                 f"can not find object {self.model} {getattr(self, self.pk_field)}"
             )
+        if use_cache:
+            state = sa_inspect(ret)
+            await self.object_cache.set(key, scope, {
+                attr.key: state.dict[attr.key] for attr in state.mapper.column_attrs if attr.key in state.dict
+            })
         return ret
 
+    def get_cache_key(self, pk) -> str:
+        return f'{self.model.__tablename__}:{pk}'
+
+    @staticmethod
+    def get_cache_scope(qs: Select) -> str:
+        """
+        查询语句与参数区分不同的数据范围，如按用户过滤的 get_queryset
+        """
+        compiled = qs.compile()
+        return hashlib.sha1(f'{compiled}:{sorted(compiled.params.items(), key=str)}'.encode()).hexdigest()
+
+    def build_cached_object(self, values: dict) -> T:
+        """
+        由缓存的列值构造对象，不经过 __init__，不加入 session，不会触发查询
+        """
+        instance = sa_inspect(self.model).class_manager.new_instance()
+        for key, value in values.items():
+            set_committed_value(instance, key, value)
+        make_transient_to_detached(instance)
+        return instance
+
+    async def invalidate_objects(self, *pks, db=None):
+        """
+        删除对象缓存：立即删除一次，事务提交后再删除一次，
+        避免提交前并发的读取把数据库中的旧数据重新写入缓存
+        """
+        if self.object_cache is None or not pks:
+            return
+        keys = [self.get_cache_key(pk) for pk in pks]
+        await self.object_cache.delete(*keys)
+        add_after_commit(self.db if db is None else db, partial(self.object_cache.delete, *keys))
+
+    async def get_projected_object(self) -> RowMapping:
+        ret = (await self.db.execute(
+            self.project((await self.get_queryset()).filter_by(**{
+                self.pk_field: getattr(self, self.pk_field)
+            }))
+        )).mappings().first()
+        if ret is None:
+            raise HTTPException(
+                400,
+                f"can not find object {self.model} {getattr(self, self.pk_field)}"
+            )
+        return ret
+
+    def use_fast_update(self, values: dict) -> bool:
+        """
+        更新的字段和返回的字段都是列、数据库支持 UPDATE ... RETURNING 且模型没有更新事件时可以直接更新
+        """
+        if not self.fast_update or not values or self.get_projection_columns() is None:
+            return False
+        mapper = sa_inspect(self.model)
+        if mapper.dispatch.before_update or mapper.dispatch.after_update:
+            return False
+        if not all(isinstance(mapper.attrs.get(name), ColumnProperty) for name in values):
+            return False
+        return self.db.get_bind().dialect.update_returning
+
+    async def fast_update_object(self, values: dict) -> RowMapping:
+        """
+        一条 UPDATE ... WHERE pk = :pk RETURNING 投影列 完成更新，
+        同时以 get_queryset 的结果作为条件，与 get_object 的范围一致
+        """
+        pk = getattr(self.model, self.pk_field)
+        if hasattr(self.model, 'updated_at'):
+            values = {**values, 'updated_at': datetime.utcnow()}
+        stmt = update(self.model).where(
+            pk == getattr(self, self.pk_field),
+            self.get_scope_condition(await self.get_queryset())
+        ).values(**values).returning(*self.get_projection_columns().values())
+        ret = (await self.db.execute(
+            stmt, execution_options={'synchronize_session': False}
+        )).mappings().first()
+        if ret is None:
+            raise HTTPException(
+                400,
+                f"can not find object {self.model} {getattr(self, self.pk_field)}"
+            )
+        await self.invalidate_objects(getattr(self, self.pk_field))
+        return ret
+
+    def get_scope_condition(self, qs: Select):
+        """
+        pk IN (get_queryset 的主键)，包一层子查询，mysql 等不允许在 UPDATE/DELETE 的子查询中直接引用被修改的表
+        """
+        pk = getattr(self.model, self.pk_field)
+        scope = qs.with_only_columns(pk).order_by(None).subquery()
+        return pk.in_(select(scope.c[0]))
+
+    def use_fast_destroy(self) -> bool:
+        """
+        模型没有删除事件、没有需要 ORM 处理的级联删除时可以直接删除
+        """
+        if not self.fast_destroy:
+            return False
+        mapper = sa_inspect(self.model)
+        if mapper.dispatch.before_delete or mapper.dispatch.after_delete:
+            return False
+        return not any(
+            relationship.cascade.delete and not relationship.passive_deletes
+            for relationship in mapper.relationships
+        )
+
+    async def fast_destroy_object(self):
+        """
+        一条 DELETE ... WHERE pk = :pk 删除，同时以 get_queryset 的结果作为条件，与 get_object 的范围一致
+        """
+        pk = getattr(self.model, self.pk_field)
+        result = await self.db.execute(
+            delete(self.model).where(
+                pk == getattr(self, self.pk_field),
+                self.get_scope_condition(await self.get_queryset())
+            ),
+            execution_options={'synchronize_session': False}
+        )
+        if result.rowcount == 0:
+            raise HTTPException(
+                400,
+                f"can not find object {self.model} {getattr(self, self.pk_field)}"
+            )
+        await self.invalidate_objects(getattr(self, self.pk_field))
+
     @classmethod
     def update_endpoint_signature(cls, func):
         func = super().update_endpoint_signature(func)
@@ -233,7 +640,7 @@ class GenericViewSet(BaseViewSet, ignores=['serializer_read', 'serializer_write'
                 annotation = cls.serializer_read
             elif annotation == W:
                 if partial:
-                    annotation = AllOptional(f'Optional{cls.serializer_write.__name__}', (cls.serializer_write,), {})
+                    annotation = cls.get_partial_serializer()
                 else:
                     annotation = cls.serializer_write
             elif t.get_origin(annotation) is list:
@@ -248,11 +655,7 @@ class GenericViewSet(BaseViewSet, ignores=['serializer_read', 'serializer_write'
             new_parameters.append(
                 param.replace(annotation=annotation)
             )
-        return_annotation = old_signature.return_annotation
-        if return_annotation == T:
-            return_annotation = cls.model
-        elif return_annotation == R:
-            return_annotation = cls.serializer_read
+        return_annotation = trans_annotation(old_signature.return_annotation)
         new_signature = old_signature.replace(
             parameters=new_parameters, return_annotation=return_annotation)
         setattr(func, "__signature__", new_signature)
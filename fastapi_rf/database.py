@@ -0,0 +1,217 @@
+import random
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class PoolMetrics:
+    """
+    连接池指标，记录获取连接的等待时间
+    """
+
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_last = 0.0
+
+    def record_wait(self, seconds: float):
+        self.checkouts += 1
+        self.wait_total += seconds
+        self.wait_last = seconds
+        if seconds > self.wait_max:
+            self.wait_max = seconds
+
+    def reset(self):
+        self.__init__()
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """
+    带指标统计的连接池，统计连接获取等待时间以及连接池饱和度
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.metrics.record_wait(time.perf_counter() - start)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def snapshot(self) -> dict:
+        size = self.size()
+        checked_out = self.checkedout()
+        # max_overflow 为 -1 时连接数不设上限，饱和度按 pool_size 计算
+        capacity = size + self._max_overflow if self._max_overflow >= 0 else size
+        metrics = self.metrics
+        return {
+            "pool_size": size,
+            "max_overflow": self._max_overflow,
+            "checked_out": checked_out,
+            "checked_in": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "saturation": checked_out / capacity if capacity else 0.0,
+            "checkouts": metrics.checkouts,
+            "wait_seconds_total": metrics.wait_total,
+            "wait_seconds_avg": metrics.wait_total / metrics.checkouts if metrics.checkouts else 0.0,
+            "wait_seconds_max": metrics.wait_max,
+            "wait_seconds_last": metrics.wait_last,
+        }
+
+
+class TrackedSession(Session):
+    """
+    记录是否发生过写操作的 Session，写操作标记保存在 info['has_writes'] 中
+    """
+
+    @property
+    def has_writes(self) -> bool:
+        return self.info.get('has_writes', False) or bool(self.new or self.dirty or self.deleted)
+
+    @property
+    def has_committed_writes(self) -> bool:
+        # 分批提交等在请求中途提交过写操作
+        return self.info.get('committed_writes', False)
+
+
+@event.listens_for(TrackedSession, 'after_flush')
+def _mark_flush_writes(session, flush_context):
+    session.info['has_writes'] = True
+
+
+@event.listens_for(TrackedSession, 'do_orm_execute')
+def _mark_execute_writes(orm_execute_state):
+    # text() 等无法判断的语句按写操作处理
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info['has_writes'] = True
+
+
+@event.listens_for(TrackedSession, 'after_commit')
+def _commit_writes(session):
+    if session.info.pop('has_writes', None):
+        session.info['committed_writes'] = True
+
+
+@event.listens_for(TrackedSession, 'after_rollback')
+def _reset_writes(session):
+    session.info.pop('has_writes', None)
+    session.info.pop('after_commit', None)
+
+
+def add_after_commit(session, callback):
+    """
+    登记提交后执行的异步回调（如删除缓存），由 commit() 在事务提交后执行，回滚时丢弃
+    """
+    session.info.setdefault('after_commit', []).append(callback)
+
+
+async def commit(session):
+    """
+    提交事务并执行 add_after_commit 登记的回调
+    """
+    await session.commit()
+    for callback in session.info.pop('after_commit', []):
+        await callback()
+
+
+class RoutingSession(TrackedSession):
+    """
+    读写分离的 Session
+
+    info['use_replica'] 为 True 时，SELECT 语句路由到 info['replicas'] 中随机选择的一个只读库，
+    同一个 session 内固定使用同一个只读库；flush、DML 以及发生写操作之后的读取都走主库。
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replicas = self.info.get('replicas')
+        if (
+                replicas
+                and self.info.get('use_replica')
+                and not self._flushing
+                and getattr(clause, 'is_select', False)
+                and not self.info.get('has_writes')
+        ):
+            replica = self.info.get('replica')
+            if replica is None:
+                replica = self.info['replica'] = random.choice(replicas)
+            return replica
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+class StickyWrites:
+    """
+    read-your-writes 粘滞窗口，记录每个客户端最后一次写入的时间（进程内）
+    """
+
+    def __init__(self, seconds: float) -> None:
+        self.seconds = seconds
+        self._last_write: dict[str, float] = {}
+
+    def mark(self, key: str):
+        now = time.monotonic()
+        self._last_write[key] = now
+        if len(self._last_write) > 10000:
+            self._last_write = {k: v for k, v in self._last_write.items() if now - v < self.seconds}
+
+    def is_sticky(self, key: str) -> bool:
+        last_write = self._last_write.get(key)
+        return last_write is not None and time.monotonic() - last_write < self.seconds
+
+
+class LazySession:
+    """
+    延迟创建的 AsyncSession 代理
+
+    首次访问 session 的属性时才真正创建 session，首次 execute/scalar 时才从连接池取连接；
+    请求结束时只有发生过写操作才提交。
+    """
+
+    def __init__(self, factory) -> None:
+        self._factory = factory
+        self._session: AsyncSession | None = None
+
+    @property
+    def session(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._factory()
+        return self._session
+
+    @property
+    def has_writes(self) -> bool:
+        if self._session is None:
+            return False
+        sync_session = self._session.sync_session
+        if isinstance(sync_session, TrackedSession):
+            return sync_session.has_writes
+        return True
+
+    @property
+    def has_committed_writes(self) -> bool:
+        if self._session is None:
+            return False
+        sync_session = self._session.sync_session
+        if isinstance(sync_session, TrackedSession):
+            return sync_session.has_committed_writes
+        return True
+
+    async def commit(self):
+        await commit(self.session)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
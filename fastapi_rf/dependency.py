@@ -1,15 +1,34 @@
 from fastapi import Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import sessionmaker
 
 from config.database import DATABASE
+from fastapi_rf.database import LazySession
 
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
 
-async def get_db(request: Request) -> AsyncSession:
-    session: AsyncSession
 
-    async with DATABASE.get_engine() as engine:
-        session = sessionmaker(engine, autoflush=False, class_=AsyncSession)
-        async with session() as db:
-            yield db
+def get_sticky_key(request: Request) -> str | None:
+    # 按登录凭证区分客户端，未登录时按客户端地址
+    authorization = request.headers.get('authorization')
+    if authorization:
+        return authorization
+    if request.client:
+        return request.client.host
+    return None
+
+
+async def get_db(request: Request) -> AsyncSession:
+    # 复用进程级的 SessionLocal，避免每个请求重新创建 sessionmaker
+    # 使用 LazySession，未访问数据库的请求不会占用连接，未写入的请求不提交
+    # GET 等安全方法的查询路由到只读库
+    sticky_key = get_sticky_key(request)
+    factory = DATABASE.get_session_factory(read_only=request.method in SAFE_METHODS, sticky_key=sticky_key)
+    db = LazySession(factory)
+    try:
+        yield db
+        if db.has_writes:
             await db.commit()
+        if db.has_committed_writes:
+            DATABASE.mark_write(sticky_key)
+    finally:
+        await db.close()
@@ -0,0 +1,83 @@
+import typing as t
+from functools import wraps
+
+from fastapi import Depends, HTTPException, Query, Response
+from pydantic import BaseModel, create_model
+
+from fastapi_rf.core import GenericViewSet, add_dependency_to_self
+
+
+class SparseFieldsMixin(GenericViewSet, ignores=['sparse_fields_actions', 'fields']):
+    """
+    稀疏字段，list/retrieve 支持通过 ?fields=id,name 只返回部分字段
+
+    请求的字段需在 serializer_read 中声明，并且会下推到查询的列中（见 GenericViewSet.projection）
+    """
+    sparse_fields_actions = ['list', 'retrieve']
+    _sparse_serializers: dict = {}
+    # 由 sparse_fields_actions 中接口的 ?fields= 参数设置，其他接口（如 bulk、export）为 None
+    fields: list[str] | None = None
+
+    def get_projection_fields(self) -> list[str]:
+        if self.fields:
+            return self.fields
+        return super().get_projection_fields()
+
+    def use_projection(self) -> bool:
+        if self.fields:
+            return self.get_projection_columns() is not None
+        return super().use_projection()
+
+    @classmethod
+    def get_sparse_serializer(cls, fields: tuple[str, ...]) -> t.Type[BaseModel]:
+        key = (cls.serializer_read, fields)
+        if key not in cls._sparse_serializers:
+            model_fields = cls.serializer_read.__fields__
+            cls._sparse_serializers[key] = create_model(
+                f"{cls.serializer_read.__name__}Sparse",
+                __config__=cls.serializer_read.__config__,
+                **{name: (model_fields[name].annotation, model_fields[name].field_info) for name in fields}
+            )
+        return cls._sparse_serializers[key]
+
+    def sparse_response(self, content) -> Response:
+        serializer = self.get_sparse_serializer(tuple(self.fields))
+        if isinstance(content, dict) and 'results' in content:
+            content = {**content, 'results': [serializer.validate(row) for row in content['results']]}
+        elif isinstance(content, (list, tuple)):
+            content = [serializer.validate(row) for row in content]
+        else:
+            content = serializer.validate(content)
+        return self.render(content)
+
+    @classmethod
+    def update_endpoint_signature(cls, func):
+        func = super().update_endpoint_signature(func)
+        if func.__name__ not in cls.sparse_fields_actions:
+            return func
+        available = list(cls.serializer_read.__fields__)
+
+        def get_fields(
+                fields: str | None = Query(None, description=f"返回的字段，逗号分隔，可选：{','.join(available)}")
+        ) -> list[str] | None:
+            if not fields:
+                return None
+            ret = []
+            for name in fields.split(','):
+                name = name.strip()
+                if not name:
+                    continue
+                if name not in available:
+                    raise HTTPException(400, f"invalid field {name}")
+                if name not in ret:
+                    ret.append(name)
+            return ret or None
+
+        @wraps(func)
+        async def sparse_func(self, *args, **kwargs):
+            ret = await func(self, *args, **kwargs)
+            if not self.fields or isinstance(ret, Response):
+                return ret
+            return self.sparse_response(ret)
+
+        return add_dependency_to_self('fields', sparse_func, default=Depends(get_fields))
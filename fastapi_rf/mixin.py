@@ -1,23 +1,120 @@
+import codecs
+import csv
+import inspect
+import io
+import json
+import re
+import typing as t
 from datetime import datetime
+from enum import Enum
 
-from fastapi import HTTPException, Response, Body
-from pydantic import BaseModel
-from sqlalchemy import delete
-from sqlalchemy.sql.expression import select
+from fastapi import BackgroundTasks, HTTPException, Response, Body, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, conlist, create_model
+from pydantic.generics import GenericModel
+from sqlalchemy import delete, tuple_, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import ColumnProperty
+from sqlalchemy.sql.expression import select, Select
 from starlette.requests import Request
 
-from fastapi_rf.core import GenericViewSet, action, W, R
+from config.database import DATABASE
+from fastapi_rf.database import commit
+from fastapi_rf.core import GenericViewSet, action, W, R, get_value
 from fastapi_rf.pagination import PaginationMixin
+from fastapi_rf.responses import FastJSONResponse
+from fastapi_rf.serializers import BaseSchemaModel
+from fastapi_rf.utils import format_datetime_into_isoformat
 
 
-class ListMixin(PaginationMixin, GenericViewSet):
-    async def list(self):
+class ListFormat(str, Enum):
+    columnar = 'columnar'
+
+
+class IngestChunk(BaseModel):
+    chunk: int
+    start: int
+    end: int
+    inserted: int
+    failed: int
+    error: str | None = None
+
+
+T = t.TypeVar("T")
+
+
+class BulkRetrieveResp(GenericModel, t.Generic[T]):
+    results: list[T]
+    missing: list
+    Config = BaseSchemaModel.Config
+
+
+class UpsertResult(BaseModel):
+    inserted: int = 0
+    updated: int = 0
+
+
+class IngestResult(BaseModel):
+    total: int = 0
+    inserted: int = 0
+    failed: int = 0
+    chunks: list[IngestChunk] = []
+    errors: list[dict] = []
+    error: str | None = None
+
+
+# 不完整时需要等待更多数据的 json 字面量
+_JSON_LITERALS = ('true', 'false', 'null', 'NaN', 'Infinity', '-Infinity')
+
+
+class ListMixin(PaginationMixin, GenericViewSet, ignores=['list_stream', 'stream_chunk_size']):
+    # 不翻页时以 NDJSON 流式返回，使用服务端游标分批查询，内存占用与数据量无关
+    list_stream: bool = False
+    stream_chunk_size: int = 1000
+
+    async def list(
+            self,
+            response_format: ListFormat | None = Query(
+                None, alias='format', description='columnar: 按列返回 {"columns": [...], "data": {列: [值...]}}'
+            )
+    ):
+        qs = await self.get_queryset()
+        not_modified = await self.check_not_modified(qs)
+        if not_modified is not None:
+            return not_modified
+        if response_format == ListFormat.columnar:
+            if self.pagination_class:
+                ret = await self.pagination_class.paginate(qs, view=self)
+                return self.render({**ret, 'results': self.to_columnar(ret['results'])})
+            return self.render(self.to_columnar(await self.get_results(qs)))
         if self.pagination_class:
-            return await self.pagination_class.paginate(await self.get_queryset())
-        ret = await self.db.scalars(
-            await self.get_queryset()
-        )
-        return ret.all()
+            return await self.pagination_class.paginate(qs, view=self)
+        if self.list_stream:
+            return StreamingResponse(self.stream_ndjson(qs), media_type='application/x-ndjson')
+        return await self.get_results(qs)
+
+    def to_columnar(self, rows: list) -> dict:
+        """
+        按列组织返回值，直接从查询结果的行中取值，不为每行创建对象
+        """
+        fields = self.get_projection_fields()
+        if self.get_projection_columns() is None:
+            # 有关系等非列字段时，先用 serializer_read 转换
+            serializer = self.serializer_read
+            rows = [serializer.validate(row) for row in rows]
+        return {
+            'columns': fields,
+            'data': {field: [get_value(row, field) for row in rows] for field in fields}
+        }
+
+    async def stream_ndjson(self, qs: Select) -> t.AsyncIterator[bytes]:
+        serializer = self.serializer_read
+        async for partition in self.iter_results(qs, self.stream_chunk_size):
+            yield b''.join(
+                FastJSONResponse.dumps(serializer.validate(row)) + b'\n' for row in partition
+            )
 
     @classmethod
     def discover_endpoint(cls):
@@ -53,21 +150,9 @@ class CreateMixin(GenericViewSet):
 
 class BatchCreateMixin(GenericViewSet):
     async def batch_create(self, body: list[W]) -> list[R]:
-        # query = select(self.model).filter_by(**body.dict())
-        # if await self.db.scalar(query):
-        #     raise HTTPException(
-        #         400,
-        #         "record already exists"
-        #     )
-        rels = []
-        for _body in body:
-            data = _body.dict()
-            data.update(await self.get_create_extra_info())
-            instance = self.model(**data)
-            self.db.add(instance)
-            await self.db.flush()
-            rels.append(instance)
-        return rels
+        # 额外信息每个请求只获取一次，按批批量插入
+        extra_info = await self.get_create_extra_info()
+        return await self.bulk_insert([{**_body.dict(), **extra_info} for _body in body])
 
     async def get_create_extra_info(self) -> dict:
         return {}
@@ -78,8 +163,286 @@ class BatchCreateMixin(GenericViewSet):
         return super().discover_endpoint()
 
 
+class UpsertMixin(GenericViewSet, ignores=['upsert_conflict_fields', 'upsert_chunk_size']):
+    """
+    批量 upsert，按 upsert_conflict_fields 判断记录是否已存在，存在时更新请求中的字段，不存在时插入；
+    sqlite/postgresql 使用 INSERT ... ON CONFLICT，mysql 使用 INSERT ... ON DUPLICATE KEY UPDATE，
+    upsert_conflict_fields 需要有唯一约束（mysql 按表上的唯一约束判断冲突）
+    """
+    upsert_conflict_fields: tuple[str, ...] = ()
+    upsert_chunk_size: int = 1000
+
+    async def upsert(self, body: list[W]) -> UpsertResult:
+        conflict_fields = self.upsert_conflict_fields
+        extra_info = await self.get_create_extra_info()
+        # 冲突键可以来自 serializer_write 或 get_create_extra_info
+        fields = {*self.serializer_write.__fields__, *extra_info}
+        missing = [field for field in conflict_fields if field not in fields]
+        if missing:
+            raise HTTPException(400, f"upsert requires fields {missing}")
+        # 同一个冲突键只保留最后一条，postgresql 不允许一条语句中多次更新同一行
+        rows = {}
+        for item in body:
+            data = {**item.dict(), **extra_info}
+            rows[tuple(data[field] for field in conflict_fields)] = data
+        rows = list(rows.values())
+        # 额外信息只在插入时写入
+        update_fields = [
+            field for field in (rows[0] if rows else {})
+            if field not in conflict_fields and field not in extra_info
+        ]
+        if hasattr(self.model, 'updated_at'):
+            update_fields.append('updated_at')
+            now = datetime.utcnow()
+            for row in rows:
+                row['updated_at'] = now
+        # 不支持的数据库在执行任何查询前报错
+        stmt = self.get_upsert_statement(update_fields)
+        result = UpsertResult()
+        pk = getattr(self.model, self.pk_field)
+        scope = self.get_scope_condition(await self.get_queryset())
+        for i in range(0, len(rows), self.upsert_chunk_size):
+            chunk = rows[i:i + self.upsert_chunk_size]
+            existing = await self.get_existing_pks(chunk)
+            # 与 batch_update 一致，只能更新 get_queryset 范围内的记录，冲突的记录不在范围内时整个请求失败
+            in_scope = set(await self.db.scalars(select(pk).where(pk.in_(existing), scope))) if existing else set()
+            outside = [value for value in existing if value not in in_scope]
+            if outside:
+                raise HTTPException(400, f"can not find object {self.model} {outside}")
+            await self.db.execute(stmt, chunk)
+            await self.invalidate_objects(*existing)
+            result.inserted += len(chunk) - len(existing)
+            result.updated += len(existing)
+        return result
+
+    async def get_existing_pks(self, rows: list[dict]) -> list:
+        """
+        查询已存在记录的主键，用于区分插入与更新的条数以及删除对象缓存
+        """
+        conflict_fields = self.upsert_conflict_fields
+        if len(conflict_fields) == 1:
+            field = conflict_fields[0]
+            condition = getattr(self.model, field).in_([row[field] for row in rows])
+        else:
+            condition = tuple_(*(getattr(self.model, field) for field in conflict_fields)).in_(
+                [tuple(row[field] for field in conflict_fields) for row in rows]
+            )
+        return list(await self.db.scalars(select(getattr(self.model, self.pk_field)).where(condition)))
+
+    def get_upsert_statement(self, update_fields: list[str]):
+        dialect = self.db.get_bind().dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            stmt = (postgresql if dialect == 'postgresql' else sqlite).insert(self.model)
+            if not update_fields:
+                return stmt.on_conflict_do_nothing(index_elements=list(self.upsert_conflict_fields))
+            return stmt.on_conflict_do_update(
+                index_elements=list(self.upsert_conflict_fields),
+                set_={field: stmt.excluded[field] for field in update_fields}
+            )
+        if dialect in ('mysql', 'mariadb'):
+            stmt = mysql.insert(self.model)
+            # 没有需要更新的字段时，更新冲突键本身（不改变值）以忽略冲突
+            fields = update_fields or list(self.upsert_conflict_fields)
+            return stmt.on_duplicate_key_update({field: stmt.inserted[field] for field in fields})
+        raise HTTPException(501, f'upsert is not supported for {dialect}')
+
+    async def get_create_extra_info(self) -> dict:
+        return {}
+
+    @classmethod
+    def discover_endpoint(cls):
+        # 注册路由时检查配置，避免每次请求才报错
+        if not cls.upsert_conflict_fields:
+            raise ValueError(f'{cls.__name__}.upsert_conflict_fields is required')
+        for field in cls.upsert_conflict_fields:
+            attr = getattr(cls.model, field, None)
+            if not isinstance(getattr(attr, 'property', None), ColumnProperty):
+                raise ValueError(f'{cls.__name__}.upsert_conflict_fields: {field} is not a column')
+        cls.upsert = action('post', '/upsert', detail=False)(cls.upsert)
+        return super().discover_endpoint()
+
+
+class IngestMixin(GenericViewSet, ignores=['ingest_chunk_size', 'ingest_max_record_size', 'ingest_max_errors']):
+    """
+    流式导入，请求体为 NDJSON（每行一个对象）或 JSON 数组，边读取边解析，
+    逐条按 serializer_write 校验，每 ingest_chunk_size 条批量插入并提交一次，
+    内存占用与请求体大小无关；某一批插入失败时回滚该批并继续处理后续数据
+    """
+    ingest_chunk_size: int = 1000
+    # 单条记录的最大字节数，超过时视为请求体格式错误
+    ingest_max_record_size: int = 1024 * 1024
+    # 返回的错误明细条数上限
+    ingest_max_errors: int = 100
+
+    async def ingest(self, request: Request) -> IngestResult:
+        result = IngestResult()
+        extra_info = await self.get_create_extra_info()
+        serializer = self.serializer_write
+        chunk, chunk_start, chunk_failed = [], 0, 0
+        try:
+            async for index, record, error in self.iter_records(request):
+                if index - chunk_start >= self.ingest_chunk_size:
+                    await self.ingest_chunk(result, chunk, chunk_start, index - 1, chunk_failed)
+                    chunk, chunk_start, chunk_failed = [], index, 0
+                result.total += 1
+                if error is None:
+                    try:
+                        chunk.append({**serializer.parse_obj(record).dict(), **extra_info})
+                        continue
+                    except ValidationError as e:
+                        error = e.errors()
+                chunk_failed += 1
+                if len(result.errors) < self.ingest_max_errors:
+                    result.errors.append({'index': index, 'errors': error})
+        except ValueError as e:
+            # 请求体格式错误，之前已提交的批次保留
+            result.error = str(e)
+        if result.total > chunk_start:
+            await self.ingest_chunk(result, chunk, chunk_start, result.total - 1, chunk_failed)
+        return result
+
+    async def ingest_chunk(self, result: IngestResult, rows: list[dict], start: int, end: int, failed: int):
+        chunk = IngestChunk(chunk=len(result.chunks), start=start, end=end, inserted=0, failed=failed)
+        if rows:
+            try:
+                await self.bulk_insert(rows)
+                await self.db.commit()
+                chunk.inserted = len(rows)
+            except DBAPIError as e:
+                await self.db.rollback()
+                chunk.failed += len(rows)
+                chunk.error = str(e.orig)
+            # 已提交的对象不再需要，释放内存
+            self.db.expunge_all()
+        result.inserted += chunk.inserted
+        result.failed += chunk.failed
+        result.chunks.append(chunk)
+
+    async def iter_records(self, request: Request) -> t.AsyncIterator[tuple[int, t.Any, t.Any]]:
+        """
+        增量解析请求体，返回 (序号, 记录, 错误)，NDJSON 中某一行格式错误时只记录该行的错误；
+        JSON 数组或请求体整体格式错误时抛出 ValueError
+        """
+        decoder = json.JSONDecoder()
+        text_decoder = codecs.getincrementaldecoder('utf-8')()
+        buffer = ''
+        index = 0
+        # None: 尚未确定格式；True: JSON 数组；False: NDJSON
+        is_array = None
+        finished = False
+        async for data in request.stream():
+            buffer += text_decoder.decode(data)
+            if is_array is None:
+                buffer = buffer.lstrip()
+                if not buffer:
+                    continue
+                is_array = buffer[0] == '['
+                if is_array:
+                    buffer = buffer[1:]
+            invalid = None
+            if is_array:
+                records, buffer, finished, invalid = self.decode_array(decoder, buffer, finished)
+            else:
+                *lines, buffer = buffer.split('\n')
+                records = [self.decode_line(decoder, line) for line in lines if line.strip()]
+            for record, error in records:
+                yield index, record, error
+                index += 1
+            if invalid is not None:
+                raise ValueError(f'invalid json at record {index}: {invalid.msg}')
+            if finished and buffer.strip():
+                raise ValueError('unexpected data after json array')
+            if len(buffer) > self.ingest_max_record_size:
+                raise ValueError(f'record {index} exceeds {self.ingest_max_record_size} bytes')
+        buffer += text_decoder.decode(b'', final=True)
+        if is_array:
+            records, buffer, finished, invalid = self.decode_array(decoder, buffer, finished)
+            for record, error in records:
+                yield index, record, error
+                index += 1
+            if invalid is not None:
+                raise ValueError(f'invalid json at record {index}: {invalid.msg}')
+            if finished and buffer.strip():
+                raise ValueError('unexpected data after json array')
+            if not finished:
+                raise ValueError(f'unexpected end of json array at record {index}')
+        elif buffer.strip():
+            yield index, *self.decode_line(decoder, buffer)
+
+    @staticmethod
+    def decode_line(decoder: json.JSONDecoder, line: str) -> tuple[t.Any, t.Any]:
+        try:
+            return decoder.decode(line), None
+        except json.JSONDecodeError as e:
+            return None, [{'loc': [e.pos], 'msg': e.msg, 'type': 'value_error.jsondecode'}]
+
+    @classmethod
+    def decode_array(
+        cls, decoder: json.JSONDecoder, buffer: str, finished: bool
+    ) -> tuple[list, str, bool, json.JSONDecodeError | None]:
+        """
+        从缓冲区中解析出完整的数组元素，返回 (元素, 剩余缓冲区, 数组是否已结束, 格式错误)；
+        元素不完整时等待更多数据，格式错误时返回错误之前的元素与该错误
+        """
+        records = []
+        pos = 0
+        length = len(buffer)
+        while not finished:
+            while pos < length and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos >= length:
+                break
+            if buffer[pos] == ']':
+                finished = True
+                pos += 1
+                break
+            try:
+                record, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                if cls.is_incomplete_json(e):
+                    break
+                return records, buffer[pos:], finished, e
+            records.append((record, None))
+        return records, buffer[pos:], finished, None
+
+    @staticmethod
+    def is_incomplete_json(error: json.JSONDecodeError) -> bool:
+        """
+        解析错误是否只是因为数据还没有读完：错误位于缓冲区末尾，或从错误位置到末尾是字符串、转义、
+        数字或 true/false/null 等字面量的开头部分
+        """
+        tail = error.doc[error.pos:]
+        if not tail or error.msg.startswith('Unterminated string'):
+            return True
+        if error.msg.startswith('Invalid \\uXXXX escape'):
+            return re.fullmatch(r'u[0-9a-fA-F]{0,3}', tail) is not None
+        if any(literal.startswith(tail) for literal in _JSON_LITERALS):
+            return True
+        return re.fullmatch(r'-?\d*(\.\d*)?([eE][+-]?\d*)?', tail) is not None
+
+    async def get_create_extra_info(self) -> dict:
+        return {}
+
+    @classmethod
+    def discover_endpoint(cls):
+        # 请求体不经过 fastapi 解析，在文档中单独声明
+        cls.ingest = action('post', '/ingest', detail=False, openapi_extra={'requestBody': {
+            'required': True,
+            'content': {
+                'application/x-ndjson': {'schema': {'type': 'string', 'description': '每行一个 json 对象'}},
+                'application/json': {'schema': {'type': 'array', 'items': {'type': 'object'}}},
+            },
+        }})(cls.ingest)
+        return super().discover_endpoint()
+
+
 class RetrieveMixin(GenericViewSet):
     async def retrieve(self) -> R:
+        not_modified = await self.check_not_modified(await self.get_queryset(), detail=True)
+        if not_modified is not None:
+            return not_modified
+        if self.use_projection():
+            return await self.get_projected_object()
         return await self.get_object()
 
     @classmethod
@@ -88,17 +451,66 @@ class RetrieveMixin(GenericViewSet):
         return super().discover_endpoint()
 
 
+class BulkRetrieveMixin(GenericViewSet, ignores=['bulk_retrieve_max_ids']):
+    """
+    按主键批量获取，GET /bulk/?ids=1,2,3，一条 pk IN 查询，按请求的顺序返回，并返回不存在的主键
+    """
+    # 单次请求最多获取的主键数
+    bulk_retrieve_max_ids: int = 1000
+
+    async def bulk_retrieve(self, ids: str = Query(..., description='逗号分隔的主键，如 1,2,3')):
+        pks = []
+        for value in ids.split(','):
+            value = value.strip()
+            if not value:
+                continue
+            try:
+                pks.append(self.pk_type(value))
+            except (TypeError, ValueError):
+                raise HTTPException(400, f"invalid {self.pk_field}: {value}")
+        pks = list(dict.fromkeys(pks))
+        if len(pks) > self.bulk_retrieve_max_ids:
+            raise HTTPException(400, f"at most {self.bulk_retrieve_max_ids} ids are allowed")
+        rows = await self.get_results(
+            (await self.get_queryset()).where(getattr(self.model, self.pk_field).in_(pks))
+        ) if pks else []
+        found = {get_value(row, self.pk_field): row for row in rows}
+        return {
+            'results': [found[pk] for pk in pks if pk in found],
+            'missing': [pk for pk in pks if pk not in found]
+        }
+
+    @classmethod
+    def update_endpoint_signature(cls, func):
+        func = super().update_endpoint_signature(func)
+        if func.__name__ == 'bulk_retrieve':
+            signature = inspect.signature(func)
+            setattr(func, '__signature__', signature.replace(
+                return_annotation=BulkRetrieveResp[cls.serializer_read]
+            ))
+        return func
+
+    @classmethod
+    def discover_endpoint(cls):
+        cls.bulk_retrieve = action('get', '/bulk', detail=False)(cls.bulk_retrieve)
+        return super().discover_endpoint()
+
+
 class UpdateMixin(GenericViewSet):
     async def update(self, body: W) -> R:
         if body is None:
             raise HTTPException(400, "body required")
+        values = body.dict()
+        if self.use_fast_update(values):
+            return await self.fast_update_object(values)
         instance = await self.get_object()
-        for k, v in body.dict().items():
+        for k, v in values.items():
             setattr(instance, k, v)
         if hasattr(instance, 'updated_at'):
             instance.updated_at = datetime.utcnow()
         self.db.add(instance)
         await self.db.flush()
+        await self.invalidate_objects(getattr(self, self.pk_field))
         return instance
 
     @classmethod
@@ -112,15 +524,18 @@ class PartialUpdateMixin(GenericViewSet):
         raw_body = await request.json()
         if body is None:
             raise HTTPException(400, 'body required')
+        # 部分更新，如果request中没放东西，就不更新
+        values = {k: v for k, v in body.dict().items() if k in raw_body.keys()}
+        if self.use_fast_update(values):
+            return await self.fast_update_object(values)
         instance = await self.get_object()
-        for k, v in body.dict().items():
-            # 部分更新，如果request中没放东西，就不更新
-            if k in raw_body.keys():
-                setattr(instance, k, v)
+        for k, v in values.items():
+            setattr(instance, k, v)
         if hasattr(instance, 'updated_at'):
             instance.updated_at = datetime.utcnow()
         self.db.add(instance)
         await self.db.flush()
+        await self.invalidate_objects(getattr(self, self.pk_field))
         return instance
 
     @classmethod
@@ -129,10 +544,95 @@ class PartialUpdateMixin(GenericViewSet):
         return super().discover_endpoint()
 
 
+class BatchUpdateMixin(GenericViewSet, ignores=['batch_update_max_items']):
+    """
+    批量部分更新，请求体为 [{主键, 字段...}]，每条只更新请求中出现的字段；
+    同一主键出现多次时按请求顺序合并，修改的字段相同的记录合并为一条按主键的 UPDATE（executemany）执行
+    """
+    # 单次请求最多更新的记录数，在请求体校验时限制
+    batch_update_max_items: int = 1000
+    _batch_update_serializers = {}
+
+    async def batch_update(self, body: list[W]) -> list[R]:
+        if not body:
+            return []
+        pk_field = self.pk_field
+        pk_column = getattr(self.model, pk_field)
+        pks = [getattr(item, pk_field) for item in body]
+        # 与 get_object 一致，只能更新 get_queryset 范围内的记录
+        found = set(await self.db.scalars(
+            (await self.get_queryset()).with_only_columns(pk_column).where(pk_column.in_(set(pks)))
+        ))
+        missing = [pk for pk in pks if pk not in found]
+        if missing:
+            raise HTTPException(400, f"can not find object {self.model} {missing}")
+        merged = {}
+        for item in body:
+            merged.setdefault(getattr(item, pk_field), {}).update(item.dict(exclude_unset=True))
+        now = datetime.utcnow()
+        groups = {}
+        for data in merged.values():
+            if len(data) <= 1:
+                continue
+            if hasattr(self.model, 'updated_at'):
+                data['updated_at'] = now
+            groups.setdefault(frozenset(data), []).append(data)
+        for rows in groups.values():
+            await self.db.execute(update(self.model), rows)
+        await self.invalidate_objects(*found)
+        instances = {
+            getattr(instance, pk_field): instance for instance in await self.db.scalars(
+                self.with_loader_options(select(self.model).where(pk_column.in_(found)))
+                .execution_options(populate_existing=True)
+            )
+        }
+        return [instances[pk] for pk in pks]
+
+    @classmethod
+    def get_batch_update_serializer(cls) -> t.Type[BaseModel]:
+        """
+        部分更新 serializer 加上必填的主键
+        """
+        key = (cls.serializer_write, cls.pk_field, cls.pk_type)
+        serializer = BatchUpdateMixin._batch_update_serializers.get(key)
+        if serializer is None:
+            serializer = BatchUpdateMixin._batch_update_serializers[key] = create_model(
+                f'BatchUpdate{cls.serializer_write.__name__}',
+                __base__=cls.get_partial_serializer(),
+                **{cls.pk_field: (cls.pk_type, ...)}
+            )
+            # AllOptional 会将子类的字段也设为可选
+            serializer.__fields__[cls.pk_field].required = True
+        return serializer
+
+    @classmethod
+    def update_endpoint_signature(cls, func):
+        func = super().update_endpoint_signature(func)
+        if func.__name__ == 'batch_update':
+            signature = inspect.signature(func)
+            body = signature.parameters['body'].replace(
+                annotation=conlist(cls.get_batch_update_serializer(), max_items=cls.batch_update_max_items)
+            )
+            setattr(func, '__signature__', signature.replace(parameters=[
+                body if param.name == 'body' else param for param in signature.parameters.values()
+            ]))
+        return func
+
+    @classmethod
+    def discover_endpoint(cls):
+        cls.batch_update = action('post', '/batch_update', detail=False)(cls.batch_update)
+        return super().discover_endpoint()
+
+
 class DestroyMixin(GenericViewSet):
     async def destroy(self):
+        if self.use_fast_destroy():
+            await self.fast_destroy_object()
+            return Response(status_code=204)
         instance = await self.get_object()
         await self.db.delete(instance)
+        await self.db.flush()
+        await self.invalidate_objects(getattr(self, self.pk_field))
         return Response(status_code=204)
 
     @classmethod
@@ -141,17 +641,114 @@ class DestroyMixin(GenericViewSet):
         return super().discover_endpoint()
 
 
-class BatchDestroyMixin(GenericViewSet):
+class BatchDestroyMixin(GenericViewSet, ignores=[
+    'batch_destroy_chunk_size', 'batch_destroy_max_items', 'batch_destroy_background_threshold'
+]):
+    # 每批删除的主键数，每批单独提交，避免 IN 列表过长和长时间持有锁
+    batch_destroy_chunk_size: int = 1000
+    # 单次请求最多删除的主键数，在请求体校验时限制
+    batch_destroy_max_items: int = 100000
+    # 主键数超过该值时在后台删除，立即返回 202，为 None 时不使用后台删除
+    batch_destroy_background_threshold: int | None = None
+    _batch_destroy_serializers = {}
+
     class BatchDestroy(BaseModel):
         pks: list
 
-    async def batch_destroy(self, data: BatchDestroy):
-        await self.db.execute(delete(self.model).where(
-            getattr(self.model, self.pk_field).in_(data.pks)
-        ))
+    async def batch_destroy(self, data: BatchDestroy, background_tasks: BackgroundTasks):
+        # 与 get_object 一致，只删除 get_queryset 范围内的记录；查询语句在请求内生成，后台删除时同样适用
+        qs = await self.get_queryset()
+        threshold = self.batch_destroy_background_threshold
+        if threshold is not None and len(data.pks) > threshold:
+            background_tasks.add_task(self.background_destroy_chunks, qs, data.pks)
+            return Response(status_code=202)
+        await self.destroy_chunks(self.db, qs, data.pks)
         return Response(status_code=204)
 
+    async def destroy_chunks(self, db: AsyncSession, qs: Select, pks: list):
+        pk = getattr(self.model, self.pk_field)
+        scope = self.get_scope_condition(qs)
+        chunk_size = self.batch_destroy_chunk_size
+        for i in range(0, len(pks), chunk_size):
+            chunk = pks[i:i + chunk_size]
+            await db.execute(
+                delete(self.model).where(pk.in_(chunk), scope), execution_options={'synchronize_session': False}
+            )
+            await self.invalidate_objects(*chunk, db=db)
+            await commit(db)
+
+    async def background_destroy_chunks(self, qs: Select, pks: list):
+        # 请求的 session 在返回响应后关闭，后台删除使用单独的 session
+        async with DATABASE.SessionLocal() as db:
+            await self.destroy_chunks(db, qs, pks)
+
+    @classmethod
+    def get_batch_destroy_serializer(cls) -> t.Type[BaseModel]:
+        max_items = cls.batch_destroy_max_items
+        serializer = BatchDestroyMixin._batch_destroy_serializers.get(max_items)
+        if serializer is None:
+            serializer = BatchDestroyMixin._batch_destroy_serializers[max_items] = create_model(
+                'BatchDestroy' if max_items == BatchDestroyMixin.batch_destroy_max_items else f'BatchDestroy{max_items}',
+                __base__=BatchDestroyMixin.BatchDestroy,
+                pks=(list[t.Any], Field(..., max_items=max_items))
+            )
+        return serializer
+
+    @classmethod
+    def update_endpoint_signature(cls, func):
+        func = super().update_endpoint_signature(func)
+        if func.__name__ == 'batch_destroy':
+            signature = inspect.signature(func)
+            data = signature.parameters['data'].replace(annotation=cls.get_batch_destroy_serializer())
+            setattr(func, '__signature__', signature.replace(parameters=[
+                data if param.name == 'data' else param for param in signature.parameters.values()
+            ]))
+        return func
+
     @classmethod
     def discover_endpoint(cls):
         cls.batch_destroy = action('post', f"/batch_destroy", detail=False)(cls.batch_destroy)
         return super().discover_endpoint()
+
+
+class ExportMixin(GenericViewSet, ignores=['export_chunk_size']):
+    # 每批从服务端游标读取并写出的行数
+    export_chunk_size: int = 1000
+
+    async def export(self):
+        return StreamingResponse(
+            self.stream_csv(await self.get_queryset()),
+            media_type='text/csv',
+            headers={'Content-Disposition': f'attachment; filename="{self.model.__tablename__}.csv"'}
+        )
+
+    async def stream_csv(self, qs: Select) -> t.AsyncIterator[bytes]:
+        serializer = self.serializer_read
+        fields = list(serializer.__fields__)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        # 带 BOM，excel 打开时中文不乱码
+        yield ('\ufeff' + buffer.getvalue()).encode()
+        async for partition in self.iter_results(qs, self.export_chunk_size):
+            buffer.seek(0)
+            buffer.truncate()
+            for row in partition:
+                data = serializer.validate(row)
+                writer.writerow([self.format_csv_value(getattr(data, field)) for field in fields])
+            yield buffer.getvalue().encode()
+
+    def format_csv_value(self, value):
+        if isinstance(value, datetime):
+            return format_datetime_into_isoformat(value)
+        # 嵌套的 serializer、列表、字典按 json 写入一个单元格
+        if isinstance(value, (BaseModel, dict, list, tuple, set, frozenset)):
+            return FastJSONResponse.dumps(value).decode()
+        if isinstance(value, Enum):
+            return value.value
+        return value
+
+    @classmethod
+    def discover_endpoint(cls):
+        cls.export = action('get', '/export', detail=False)(cls.export)
+        return super().discover_endpoint()
@@ -1,14 +1,18 @@
+import base64
+import datetime
 import inspect
+import json
+import time
 import typing as t
 from typing import Any
 
-from fastapi import Depends
+from fastapi import Depends, HTTPException
 from pydantic.generics import GenericModel
-from sqlalchemy import select, func
+from sqlalchemy import select, func, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import Select
 
-from fastapi_rf.core import BaseViewSet, add_dependency_to_self
+from fastapi_rf.core import BaseViewSet, add_dependency_to_self, get_value
 # Dependency
 from fastapi_rf.dependency import get_db
 from fastapi_rf.serializers import BaseSchemaModel
@@ -16,16 +20,129 @@ from fastapi_rf.serializers import BaseSchemaModel
 
 class BasePagination:
     _cache_return_type = {}
+    # 统计总数的缓存 {key: (过期时间, 总数)}
+    _count_cache: dict[tuple, tuple[float, int]] = {}
+    COUNT_CACHE_MAX_SIZE = 1000
+    db: AsyncSession
 
-    async def paginate(self, qs: Select) -> Any:
+    async def paginate(self, qs: Select, view: BaseViewSet = None) -> Any:
         raise NotImplementedError
 
+    async def get_total(self, qs: Select, view: BaseViewSet = None) -> tuple[int | None, str]:
+        """
+        按视图的 pagination_count 统计总数，返回 (总数, 统计方式)
+
+        - exact: select count(*)
+        - none: 不统计，总数为 None
+        - cached: 按查询语句及参数缓存 pagination_count_ttl 秒，命中缓存时统计方式为 cached
+        - estimate: 使用数据库执行计划的估算行数，估算值不超过 pagination_count_threshold 时仍精确统计
+        - window: 由 fetch_page 在查询当前页时用 count(*) over () 一并取回，这里按 exact 处理
+        """
+        mode = getattr(view, 'pagination_count', None) or 'exact'
+        if mode == 'none':
+            return None, 'none'
+        if mode == 'cached':
+            compiled = qs.order_by(None).compile()
+            key = (str(compiled), tuple(sorted((k, repr(v)) for k, v in compiled.params.items())))
+            now = time.monotonic()
+            cached = self._count_cache.get(key)
+            if cached is not None and cached[0] > now:
+                return cached[1], 'cached'
+            total = await self.count(qs)
+            if len(self._count_cache) >= self.COUNT_CACHE_MAX_SIZE:
+                for k, v in list(self._count_cache.items()):
+                    if v[0] <= now:
+                        self._count_cache.pop(k, None)
+                if len(self._count_cache) >= self.COUNT_CACHE_MAX_SIZE:
+                    self._count_cache.clear()
+            self._count_cache[key] = (now + view.pagination_count_ttl, total)
+            return total, 'exact'
+        if mode == 'estimate':
+            estimate = await self.estimate_count(qs)
+            if estimate is not None and estimate > view.pagination_count_threshold:
+                return estimate, 'estimate'
+        return await self.count(qs), 'exact'
+
+    async def count(self, qs: Select) -> int:
+        return await self.db.scalar(select(func.count("*")).select_from(qs.order_by(None).subquery()))
+
+    async def fetch_page(self, qs: Select, limit: int, offset: int, view: BaseViewSet = None) -> tuple[list, int | None, str]:
+        """
+        查询当前页并统计总数，返回 (当前页数据, 总数, 统计方式)
+        """
+        window = getattr(view, 'pagination_count', None) == 'window'
+        deferred = getattr(view, 'pagination_deferred_join', False)
+        projection = view is not None and view.use_projection()
+        page_qs = qs
+        if deferred:
+            # 延迟关联：按相同的条件与排序只查询当前页的主键，再按主键取整行，避免数据库读取被 OFFSET 丢弃的整行
+            page_qs = qs.with_only_columns(getattr(view.model, view.pk_field), maintain_column_froms=True)
+        elif projection:
+            page_qs = view.project(qs)
+        elif view is not None:
+            page_qs = view.with_loader_options(qs)
+        if window:
+            # 当前页与总数在同一条语句中取回，只需一次往返
+            page_qs = page_qs.add_columns(func.count().over().label('_total'))
+        page_qs = page_qs.limit(limit).offset(offset)
+        if window:
+            result = await self.db.execute(page_qs)
+            rows = result.all()
+            if projection and not deferred:
+                keys = list(result.keys())[:-1]
+                ret = [dict(zip(keys, row[:-1])) for row in rows]
+            else:
+                ret = [row[0] for row in rows]
+            if rows:
+                total, total_mode = rows[0][-1], 'window'
+            elif offset == 0:
+                total, total_mode = 0, 'window'
+            else:
+                # 页码超出范围时没有返回行，无法得到总数，退回 count 查询
+                total, total_mode = await self.count(qs), 'exact'
+        else:
+            if projection and not deferred:
+                ret = (await self.db.execute(page_qs)).mappings().all()
+            else:
+                ret = (await self.db.scalars(page_qs)).all()
+            total, total_mode = await self.get_total(qs, view)
+        if deferred and ret:
+            ret = await self.fetch_by_pks(qs, ret, view)
+        return ret, total, total_mode
+
+    async def fetch_by_pks(self, qs: Select, pks: list, view: BaseViewSet) -> list:
+        """
+        按主键取整行，并保持 pks 的顺序
+        """
+        pk = getattr(view.model, view.pk_field)
+        ret = await view.get_results(qs.order_by(None).where(pk.in_(pks)))
+        instances = {get_value(instance, view.pk_field): instance for instance in ret}
+        return [instances[pk_value] for pk_value in pks if pk_value in instances]
+
+    async def estimate_count(self, qs: Select) -> int | None:
+        """
+        从执行计划中读取估算行数，目前仅支持 postgresql，其他数据库返回 None
+        """
+        connection = await self.db.connection(bind_arguments={'clause': qs})
+        dialect = connection.dialect
+        if dialect.name != 'postgresql':
+            return None
+        compiled = qs.order_by(None).compile(dialect=dialect, compile_kwargs={'render_postcompile': True})
+        params = compiled.params
+        if compiled.positional:
+            params = tuple(params[name] for name in compiled.positiontup)
+        plan = (await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", params)).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
     @classmethod
     def get_paginated_return_type(cls, model: Any):
-        if cls._cache_return_type.get(model):
-            return cls._cache_return_type[model]
+        # 不同的翻页类对同一个 model 的返回结构不同，缓存需要区分翻页类
+        if cls._cache_return_type.get((cls, model)):
+            return cls._cache_return_type[(cls, model)]
         ret = cls.get_schema(model)
-        cls._cache_return_type[model] = ret
+        cls._cache_return_type[(cls, model)] = ret
         return ret
 
     @classmethod
@@ -40,7 +157,8 @@ T = t.TypeVar("T")
 
 
 class LimitOffsetResp(GenericModel, t.Generic[T]):
-    total: int
+    total: int | None
+    total_mode: str = 'exact'
     limit: int
     offset: int
     results: list[T]
@@ -59,13 +177,11 @@ class LimitOffsetPagination(BasePagination):
     def get_schema(cls, model: Any):
         return LimitOffsetResp[model]
 
-    async def paginate(self, qs: Select):
-        ret = await self.db.scalars(
-            qs.limit(self.limit).offset(self.offset)
-        )
-        ret = ret.all()
+    async def paginate(self, qs: Select, view: BaseViewSet = None):
+        ret, total, total_mode = await self.fetch_page(qs, self.limit, self.offset, view)
         return {
-            "total": await self.db.scalar(select(func.count("*")).select_from(qs.subquery())),
+            "total": total,
+            "total_mode": total_mode,
             "limit": self.limit,
             "offset": self.offset,
             "results": ret
@@ -75,7 +191,8 @@ class LimitOffsetPagination(BasePagination):
 class PageSizeResp(GenericModel, t.Generic[T]):
     page_num: int
     page_size: int
-    total: int
+    total: int | None
+    total_mode: str = 'exact'
     results: list[T]
     Config = BaseSchemaModel.Config
 
@@ -92,21 +209,157 @@ class PageSizePagination(BasePagination):
     def get_schema(cls, model: Any):
         return PageSizeResp[model]
 
-    async def paginate(self, qs: Select):
-        ret = await self.db.scalars(
-            qs.limit(self.page_size).offset(self.page_num * self.page_size - self.page_size)
+    async def paginate(self, qs: Select, view: BaseViewSet = None):
+        ret, total, total_mode = await self.fetch_page(
+            qs, self.page_size, self.page_num * self.page_size - self.page_size, view
         )
-        ret = ret.all()
         return {
-            "total": await self.db.scalar(select(func.count("*")).select_from(qs.subquery())),
+            "total": total,
+            "total_mode": total_mode,
             "page_num": self.page_num,
             "page_size": self.page_size,
             "results": ret
         }
 
 
-class PaginationMixin(BaseViewSet, ignores=['pagination_class']):
+class CursorResp(GenericModel, t.Generic[T]):
+    next: str | None
+    previous: str | None
+    page_size: int
+    results: list[T]
+    Config = BaseSchemaModel.Config
+
+
+class CursorPagination(BasePagination):
+    """
+    基于游标（keyset）的翻页
+
+    根据视图的 order_by（逗号分隔，字段前加 - 或后加 desc 表示倒序）和 pk_field 生成
+    `WHERE (排序字段, 主键) > (上一页最后一行)` 形式的条件，不使用 OFFSET，翻到任意深度的代价相同。
+    排序字段不能为 NULL。
+    """
+    DEFAULT_SIZE = 20
+
+    def __init__(self, cursor: str | None = None, page_size: int = DEFAULT_SIZE, db: AsyncSession = Depends(get_db)):
+        self.cursor = cursor
+        self.page_size = page_size
+        self.db = db
+
+    @classmethod
+    def get_schema(cls, model: Any):
+        return CursorResp[model]
+
+    @staticmethod
+    def get_ordering(view: BaseViewSet) -> list[tuple[Any, bool]]:
+        """
+        返回 [(字段, 是否倒序)]，主键总是作为最后一个排序字段，保证排序唯一
+        """
+        ordering = []
+        for item in (view.order_by or '').split(','):
+            item = item.strip()
+            if not item:
+                continue
+            descending = item.startswith('-')
+            item = item.lstrip('-').strip()
+            parts = item.split()
+            if len(parts) == 2 and parts[1].lower() in ('asc', 'desc'):
+                descending = parts[1].lower() == 'desc'
+            column = getattr(view.model, parts[0], None)
+            if column is None or len(parts) > 2:
+                raise HTTPException(400, f"invalid ordering {item}")
+            ordering.append((column, descending))
+        if view.pk_field not in [column.key for column, _ in ordering]:
+            ordering.append((getattr(view.model, view.pk_field), False))
+        return ordering
+
+    @staticmethod
+    def encode_cursor(values: list, reverse: bool) -> str:
+        def default(obj):
+            if isinstance(obj, (datetime.datetime, datetime.date)):
+                return obj.isoformat()
+            return str(obj)
+
+        data = json.dumps({"v": values, "r": reverse}, default=default, separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str, ordering: list[tuple[Any, bool]]) -> tuple[list, bool]:
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            values, reverse = data['v'], bool(data['r'])
+            assert len(values) == len(ordering)
+            ret = []
+            for value, (column, _) in zip(values, ordering):
+                try:
+                    python_type = column.type.python_type
+                except NotImplementedError:
+                    python_type = None
+                if value is not None and python_type in (datetime.datetime, datetime.date):
+                    value = python_type.fromisoformat(value)
+                ret.append(value)
+            return ret, reverse
+        except Exception:
+            raise HTTPException(400, "invalid cursor")
+
+    @staticmethod
+    def keyset_filter(ordering: list[tuple[Any, bool]], values: list, reverse: bool):
+        # (a, b) > (x, y) 展开为 a > x OR (a = x AND b > y)，兼容不支持行值比较的数据库
+        clauses = []
+        for i, (column, descending) in enumerate(ordering):
+            after = descending == reverse
+            compare = column > values[i] if after else column < values[i]
+            clauses.append(and_(*[ordering[j][0] == values[j] for j in range(i)], compare))
+        return or_(*clauses)
+
+    async def paginate(self, qs: Select, view: BaseViewSet = None):
+        ordering = self.get_ordering(view)
+        reverse = False
+        if self.cursor:
+            values, reverse = self.decode_cursor(self.cursor, ordering)
+            qs = qs.where(self.keyset_filter(ordering, values, reverse))
+        qs = qs.order_by(None).order_by(*[
+            column.desc() if descending != reverse else column.asc() for column, descending in ordering
+        ])
+        if view.use_projection():
+            qs = view.project(qs, *[column for column, _ in ordering])
+            ret = (await self.db.execute(qs.limit(self.page_size + 1))).mappings().all()
+        else:
+            ret = (await self.db.scalars(view.with_loader_options(qs).limit(self.page_size + 1))).all()
+        has_more = len(ret) > self.page_size
+        ret = ret[:self.page_size]
+        if reverse:
+            ret = ret[::-1]
+
+        def row_cursor(row, _reverse):
+            return self.encode_cursor([get_value(row, column.key) for column, _ in ordering], _reverse)
+
+        next_cursor = previous_cursor = None
+        if ret:
+            if has_more or reverse:
+                next_cursor = row_cursor(ret[-1], False)
+            if (has_more and reverse) or (self.cursor and not reverse):
+                previous_cursor = row_cursor(ret[0], True)
+        return {
+            "next": next_cursor,
+            "previous": previous_cursor,
+            "page_size": self.page_size,
+            "results": ret
+        }
+
+
+class PaginationMixin(BaseViewSet, ignores=[
+    'pagination_class', 'pagination_count', 'pagination_count_ttl', 'pagination_count_threshold',
+    'pagination_deferred_join'
+]):
     pagination_class: t.Type[BasePagination] | None = None
+    # 总数统计方式 exact/none/cached/estimate/window，见 BasePagination.get_total
+    pagination_count: str = 'exact'
+    # cached 模式下总数的缓存秒数
+    pagination_count_ttl: int = 60
+    # estimate 模式下估算值超过该值时直接返回估算值
+    pagination_count_threshold: int = 10000
+    # 延迟关联翻页，先查询当前页的主键再取整行，适合宽表的深度翻页，见 BasePagination.fetch_page
+    pagination_deferred_join: bool = False
     if t.TYPE_CHECKING:
         pagination_class: BasePagination | None = None
 
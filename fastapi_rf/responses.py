@@ -0,0 +1,222 @@
+import datetime
+import decimal
+import enum
+import inspect
+import json
+import uuid
+from functools import wraps
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from fastapi.utils import create_response_field
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.engine import RowMapping
+
+from fastapi_rf import utils
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ('application/msgpack', 'application/x-msgpack')
+
+
+def is_msgpack(media_type: str | None) -> bool:
+    return bool(media_type) and media_type.split(';', 1)[0].strip().lower() in MSGPACK_MEDIA_TYPES
+
+
+def parse_accept(accept: str) -> list[tuple[str, float]]:
+    """
+    解析请求头 Accept，返回 [(媒体类型, q)]，q 不合法时按 0 处理
+    """
+    ret = []
+    for item in accept.split(','):
+        media_type, *params = item.split(';')
+        media_type = media_type.strip().lower()
+        if not media_type:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    q = 0.0
+        ret.append((media_type, q))
+    return ret
+
+
+def get_quality(ranges: list[tuple[str, float]], media_type: str) -> float:
+    """
+    媒体类型在 Accept 中的 q，取最具体的匹配（type/subtype > type/* > */*），没有匹配时为 0
+    """
+    main_type = media_type.split('/', 1)[0]
+    for candidate in (media_type, f'{main_type}/*', '*/*'):
+        qs = [q for range_, q in ranges if range_ == candidate]
+        if qs:
+            return max(qs)
+    return 0.0
+
+
+def accepts_msgpack(request: Request | None) -> bool:
+    """
+    msgpack 的 q 严格大于 json 时返回 msgpack，其他情况（包括 */* 与未设置 Accept）返回 json
+    """
+    if msgpack is None or request is None:
+        return False
+    accept = request.headers.get('accept')
+    if not accept:
+        return False
+    ranges = parse_accept(accept)
+    return max(get_quality(ranges, t) for t in MSGPACK_MEDIA_TYPES) > get_quality(ranges, 'application/json')
+
+
+def vary_accept(response: Response | None) -> Response | None:
+    """
+    返回格式由 Accept 决定，添加 Vary: Accept，避免缓存把不同格式的响应混用
+    """
+    if response is None:
+        return response
+    vary = response.headers.get('vary')
+    if vary is None:
+        response.headers['vary'] = 'Accept'
+    elif 'accept' not in {v.strip().lower() for v in vary.split(',')}:
+        response.headers['vary'] = f'{vary}, Accept'
+    return response
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    使用 orjson（未安装时使用标准库 json）直接序列化返回值，不经过 fastapi 的 jsonable_encoder
+
+    时间按 datetime_encoder 编码，默认与 BaseSchemaModel 的 json_encoders 一致，
+    可在子类中通过 utils.make_datetime_encoder 修改时区偏移与格式
+    """
+    datetime_encoder = staticmethod(utils.make_datetime_encoder())
+
+    @classmethod
+    def default(cls, obj):
+        if isinstance(obj, BaseModel):
+            return obj.dict(by_alias=True)
+        if isinstance(obj, datetime.datetime):
+            return cls.datetime_encoder(obj)
+        if isinstance(obj, (datetime.date, datetime.time)):
+            return obj.isoformat()
+        if isinstance(obj, RowMapping):
+            return dict(obj)
+        if isinstance(obj, decimal.Decimal):
+            return float(obj)
+        if isinstance(obj, enum.Enum):
+            return obj.value
+        if isinstance(obj, uuid.UUID):
+            return str(obj)
+        if isinstance(obj, (set, frozenset, tuple)):
+            return list(obj)
+        if isinstance(obj, bytes):
+            return obj.decode()
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+    def render(self, content) -> bytes:
+        return self.dumps(content)
+
+    @classmethod
+    def dumps(cls, content) -> bytes:
+        default = cls.default
+        if orjson is not None:
+            return orjson.dumps(
+                content, default=default, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+            )
+        return json.dumps(
+            content, default=default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+
+
+class MsgPackResponse(Response):
+    media_type = 'application/msgpack'
+
+    def render(self, content) -> bytes:
+        return msgpack.packb(content, default=FastJSONResponse.default)
+
+
+class MsgPackRoute(APIRoute):
+    """
+    支持 msgpack 请求体的路由，Content-Type 为 application/msgpack 时解码后按 json 请求体处理
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            if msgpack is not None and is_msgpack(request.headers.get('content-type')):
+                body = await request.body()
+                try:
+                    data = msgpack.unpackb(body) if body else None
+                except Exception:
+                    raise HTTPException(400, 'invalid msgpack body')
+                scope = dict(request.scope)
+                scope['headers'] = [
+                    (k, b'application/json' if k == b'content-type' else v) for k, v in request.scope['headers']
+                ]
+                request = Request(scope, request.receive)
+                request._body = body
+                request._json = data
+            return await handler(request)
+
+        return route_handler
+
+
+def render_endpoint(func, response_class=None):
+    """
+    渲染 endpoint 的返回值
+
+    请求头 Accept 中 msgpack 的 q 高于 json 时返回 MsgPackResponse，否则设置了 response_class 时由其直接渲染，
+    都未命中时原样返回，交给 fastapi 处理。
+    直接渲染时返回值仍按返回类型注解校验（与 fastapi 一致），校验结果不经过 jsonable_encoder；
+    endpoint 本身返回 Response 时原样返回；所有响应都添加 Vary: Accept
+    """
+    signature = inspect.signature(func)
+    self_name = next(iter(signature.parameters))
+    return_annotation = signature.return_annotation
+    field = None
+    if return_annotation not in (inspect.Signature.empty, None) and not (
+            inspect.isclass(return_annotation) and issubclass(return_annotation, Response)
+    ):
+        field = create_response_field(name=f"Response_{func.__name__}", type_=return_annotation)
+
+    @wraps(func)
+    async def new_func(*args, **kwargs):
+        ret = await func(*args, **kwargs)
+        view = kwargs[self_name] if self_name in kwargs else args[0]
+        if isinstance(ret, Response):
+            return vary_accept(merge_headers(ret, view.response))
+        _response_class = MsgPackResponse if accepts_msgpack(view.request) else response_class
+        if _response_class is None:
+            # fastapi 会把 view.response 的响应头合并到最终响应
+            vary_accept(view.response)
+            return ret
+        if field is not None:
+            ret, errors = field.validate(ret, {}, loc=("response",))
+            if errors:
+                raise ValidationError([errors] if not isinstance(errors, list) else errors, field.type_)
+        return vary_accept(merge_headers(_response_class(ret), view.response))
+
+    return new_func
+
+
+def merge_headers(response: Response, sub_response: Response | None) -> Response:
+    """
+    endpoint 直接返回 Response 时 fastapi 不会合并依赖中设置的响应头，这里补上，已有的响应头不覆盖
+    """
+    if sub_response is not None:
+        for key, value in sub_response.headers.items():
+            if key not in response.headers:
+                response.headers[key] = value
+    return response